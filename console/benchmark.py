@@ -0,0 +1,190 @@
+#!/usr/bin/env python
+
+import io
+import os
+import sys
+import json
+import shutil
+import argparse
+import tempfile
+import contextlib
+
+import picowatch
+
+from typing import Callable, List, Tuple
+from picowatch import Picowatch, Pyboard, Tab
+
+
+def workload_small_files(project: str, scale: float) -> Callable[[Picowatch], None]:
+    for i in range(max(1, int(64 * scale))):
+        os.makedirs(os.path.join(project, f'lib{i % 4}'), exist_ok=True)
+
+        with open(os.path.join(project, f'lib{i % 4}', f'module{i}.py'), 'w') as fh:
+            fh.write(f'VALUE = {i}\n' + '# padding\n' * 24)
+
+    return lambda picowatch: picowatch.upload(['/'])
+
+
+def workload_large_file(project: str, scale: float) -> Callable[[Picowatch], None]:
+    with open(os.path.join(project, 'large.bin'), 'wb') as fh:
+        fh.write(os.urandom(max(1024, int(128 * 1024 * scale))))
+
+    def job(picowatch: Picowatch):
+        picowatch.upload(['large.bin'])
+        data, checksum = picowatch.filesystem.get('large.bin')
+
+        with open(os.path.join(project, 'large.bin'), 'rb') as fh:
+            if data != fh.read() or checksum != 'OK':
+                print(f'[?] large.bin {checksum}')
+
+    return job
+
+
+def workload_deep_tree(project: str, scale: float) -> Callable[[Picowatch], None]:
+    dirname = project
+
+    for depth in range(max(1, int(12 * scale))):
+        dirname = os.path.join(dirname, f'level{depth}')
+        os.makedirs(dirname)
+
+        for i in range(2):
+            with open(os.path.join(dirname, f'file{i}.txt'), 'w') as fh:
+                fh.write(f'{depth}.{i}\n' * 32)
+
+    def job(picowatch: Picowatch):
+        picowatch.upload(['/'])
+        picowatch.listing('/')
+
+    return job
+
+
+def workload_delta_sync(project: str, scale: float) -> Tuple[Callable[[Picowatch], None], Callable[[Picowatch], None]]:
+    size = max(16 * 1024, int(128 * 1024 * scale))
+
+    with open(os.path.join(project, 'firmware.bin'), 'wb') as fh:
+        fh.write(os.urandom(size))
+
+    for i in range(8):
+        with open(os.path.join(project, f'config{i}.json'), 'w') as fh:
+            json.dump({'index': i, 'values': list(range(64))}, fh)
+
+    def edit():
+        # A few bytes changed in the middle, a few appended and one small file changed.
+        with open(os.path.join(project, 'firmware.bin'), 'r+b') as fh:
+            fh.seek(size // 2)
+            fh.write(os.urandom(64))
+            fh.seek(0, os.SEEK_END)
+            fh.write(os.urandom(256))
+
+        with open(os.path.join(project, 'config0.json'), 'w') as fh:
+            json.dump({'index': 0, 'values': []}, fh)
+
+    def setup(picowatch: Picowatch):
+        picowatch.mirror('/')
+        edit()
+
+    return (setup, lambda picowatch: picowatch.mirror('/'))
+
+
+WORKLOADS: List[Tuple[str, Callable]] = [
+    ('small files', workload_small_files),
+    ('large file', workload_large_file),
+    ('deep tree', workload_deep_tree),
+    ('delta sync', workload_delta_sync),
+]
+
+
+def run(name: str, workload: Callable, arguments: argparse.Namespace) -> dict:
+    workspace = tempfile.mkdtemp(prefix='picowatch-benchmark-')
+    project = os.path.join(workspace, 'project')
+    os.makedirs(project)
+
+    try:
+        job = workload(project, arguments.scale)
+        setup = None
+
+        if isinstance(job, tuple):
+            setup, job = job
+
+        # Every workload gets a blank board, the console sees the project as its working directory and keeps its
+        # caches (compiled .mpy, mirror manifests) in the workspace rather than in the user's.
+        picowatch.LISTENING_TO = project
+        picowatch.CACHE_DIR = os.path.join(workspace, 'cache')
+        picowatch.MPY_CACHE_DIR = os.path.join(picowatch.CACHE_DIR, 'mpy')
+        pyboard = Pyboard(f'emulator://{os.path.join(workspace, "board")}?latency={arguments.latency}', arguments.baudrate)
+        board = Picowatch(pyboard)
+        board.filesystem.compression = arguments.compress
+        output = io.StringIO()
+
+        with contextlib.redirect_stdout(output):
+            if setup:
+                setup(board)
+
+            board.filesystem.telemetry.begin(name)
+            job(board)
+            report = board.filesystem.telemetry.end()
+
+        board.close()
+        report['workload'] = name
+        report['payload'] = sum(f['size'] for f in report['files'])
+        report['latency'] = round(report['seconds'] / report['round_trips'], 4) if report['round_trips'] else 0
+        report['failures'] = [line.strip() for line in output.getvalue().splitlines() if line.startswith('[?]')]
+
+        return report
+    finally:
+        shutil.rmtree(workspace, ignore_errors=True)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description='Benchmark the Picowatch console transfers against a simulated board.')
+    parser.add_argument('--baudrate', type=int, default=1000000, help='simulated link speed in bauds, 0 for unthrottled (default: 1000000)')
+    parser.add_argument('--latency', type=float, default=0.0005, help='simulated latency per write in seconds (default: 0.0005)')
+    parser.add_argument('--scale', type=float, default=1.0, help='scale the size of every workload (default: 1.0)')
+    parser.add_argument('--compress', action='store_true', help='enable compressed uploads')
+    parser.add_argument('--only', action='append', default=[], help='run only the named workload(s)')
+    parser.add_argument('--json', default='', help='write the reports to this JSON file')
+    arguments = parser.parse_args()
+    reports = []
+
+    for name, workload in WORKLOADS:
+        if not arguments.only or name in arguments.only:
+            reports.append(run(name, workload, arguments))
+
+    tab = Tab(14, 12, 14, 14, 12, 12, 12, 12, 10)
+    tab.head('Workload', 'Time (s)', 'Payload (kb)', 'Throughput', 'In (kb)', 'Out (kb)', 'Round trips', 'Latency', 'Failures')
+
+    for report in reports:
+        tab.line(
+            report['workload'],
+            str(report['seconds']),
+            str(round(report['payload'] / 1024, 2)),
+            f'{round(report["payload"] / max(report["seconds"], 1e-6) / 1024, 2)} kb/s',
+            str(round(report['bytes_in'] / 1024, 2)),
+            str(round(report['bytes_out'] / 1024, 2)),
+            str(report['round_trips']),
+            f'{round(report["latency"] * 1000, 1)} ms',
+            str(len(report['failures'])),
+        )
+
+    for report in reports:
+        for failure in report['failures']:
+            print(f'{report["workload"]}: {failure}')
+
+    if arguments.json:
+        with open(arguments.json, 'w') as fh:
+            json.dump({'baudrate': arguments.baudrate, 'latency': arguments.latency, 'scale': arguments.scale, 'workloads': reports}, fh, indent=4)
+
+    return 1 if any(report['failures'] for report in reports) else 0
+
+
+def test_workloads():
+    # Smoke test, run with: python -m pytest console/benchmark.py
+    for compress in [False, True]:
+        arguments = argparse.Namespace(baudrate=0, latency=0, scale=0.1, compress=compress)
+
+        for name, workload in WORKLOADS:
+            assert run(name, workload, arguments)['failures'] == []
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,405 @@
+#!/usr/bin/env python
+
+import io
+import os
+import time
+import json
+import zlib
+import errno
+import struct
+import hashlib
+import binascii
+import builtins
+import threading
+import traceback
+
+from types import SimpleNamespace
+from typing import Any, Optional, Union
+
+
+class Channel(object):
+    buffer: bytearray
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.condition = threading.Condition()
+
+    def put(self, data: bytes):
+        with self.condition:
+            self.buffer.extend(data)
+            self.condition.notify_all()
+
+    def get(self, size: int, timeout: Optional[float] = None) -> bytes:
+        with self.condition:
+            deadline = None if timeout is None else time.monotonic() + timeout
+
+            while not self.buffer:
+                remaining = None if deadline is None else deadline - time.monotonic()
+
+                if remaining is not None and remaining <= 0:
+                    return b''
+
+                self.condition.wait(remaining)
+
+            data = bytes(self.buffer[:size])
+            del self.buffer[:size]
+
+            return data
+
+    def __len__(self) -> int:
+        return len(self.buffer)
+
+
+class SoftReset(BaseException):
+    pass
+
+
+class Emulator(object):
+    # A stand-in for a MicroPython board behind a serial port: the normal and raw REPL (with raw-paste mode),
+    # Ctrl-A/B/C/D and a flash rooted in a local directory. The host side has the surface of serial.Serial.
+    timeout: float = 0.1
+    root: str
+    baudrate: int
+    latency: float
+
+    def __init__(self, root: str, baudrate: int = 0, latency: float = 0):
+        self.root = root
+        self.baudrate = int(baudrate or 0)
+        self.latency = float(latency or 0)
+        self.rx = Channel()
+        self.tx = Channel()
+        self.running = True
+        self.kbd_intr = 3
+        self.globals = {}
+        os.makedirs(root, exist_ok=True)
+        threading.Thread(target=self.run, daemon=True).start()
+
+    def throttle(self, size: int):
+        # Every write pays the link latency, then 10 bits per byte (8N1) at the given baudrate.
+        if self.latency:
+            time.sleep(self.latency)
+
+        if self.baudrate:
+            time.sleep(size * 10 / self.baudrate)
+
+    def write(self, data: bytes) -> int:
+        self.throttle(len(data))
+        self.rx.put(bytes(data))
+
+        return len(data)
+
+    def read(self, size: int = 1) -> bytes:
+        data = bytearray()
+        deadline = time.monotonic() + self.timeout
+
+        while len(data) < size:
+            if not (chunk := self.tx.get(size - len(data), max(0, deadline - time.monotonic()))):
+                break
+
+            data.extend(chunk)
+
+        return bytes(data)
+
+    def inWaiting(self) -> int:
+        return len(self.tx)
+
+    def close(self):
+        self.running = False
+        self.rx.put(b'')
+
+    def send(self, data: Union[bytes, str]):
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        self.throttle(len(data))
+        self.tx.put(data)
+
+    def getc(self) -> int:
+        while self.running:
+            if c := self.rx.get(1, 0.1):
+                return c[0]
+
+        raise SystemExit
+
+    def path(self, filename: str) -> str:
+        return os.path.join(self.root, str(filename).lstrip('/'))
+
+    def banner(self):
+        self.send('MicroPython v1.22.0 on 2024-01-01; Emulated board with Picowatch\r\nType "help()" for more information.\r\n>>> ')
+
+    def soft_reset(self):
+        self.globals = {}
+        self.kbd_intr = 3
+
+    def run(self):
+        raw_repl = False
+        line = bytearray()
+
+        try:
+            while self.running:
+                c = self.getc()
+
+                if not raw_repl:
+                    if c == 0x01:
+                        raw_repl = True
+                        self.send('\r\nraw REPL; CTRL-B to exit\r\n>')
+                    elif c == 0x03:
+                        line.clear()
+                        self.send('\r\nKeyboardInterrupt\r\n>>> ')
+                    elif c == 0x04:
+                        self.soft_reset()
+                        self.send('MPY: soft reboot\r\n')
+
+                        if os.path.isfile(self.path('main.py')):
+                            with open(self.path('main.py'), 'rb') as fh:
+                                self.execute(fh.read(), friendly=True)
+
+                        self.banner()
+                    elif c in (0x0d, 0x0a):
+                        if line:
+                            self.execute(bytes(line), friendly=True)
+
+                        line.clear()
+                        self.send('\r\n>>> ')
+                    else:
+                        line.append(c)
+                        self.send(bytes([c]))
+                elif c == 0x02:
+                    raw_repl = False
+                    line.clear()
+                    self.send('\r\n')
+                    self.banner()
+                elif c == 0x03:
+                    line.clear()
+                elif c == 0x01:
+                    line.clear()
+                    self.send('\r\nraw REPL; CTRL-B to exit\r\n>')
+                elif c == 0x05 and not line:
+                    if self.getc() == ord('A') and self.getc() == 0x01:
+                        self.raw_paste()
+                elif c == 0x04:
+                    if line:
+                        self.send('OK')
+                        self.execute(bytes(line))
+                        line.clear()
+                    else:
+                        self.soft_reset()
+                        self.send('OK\r\nMPY: soft reboot\r\nraw REPL; CTRL-B to exit\r\n>')
+                else:
+                    line.append(c)
+        except SystemExit:
+            pass
+
+    def raw_paste(self, window: int = 128):
+        self.send(b'R\x01' + struct.pack('<H', window) + b'\x01')
+        remaining = window
+        command = bytearray()
+
+        while (c := self.getc()) != 0x04:
+            command.append(c)
+            remaining -= 1
+
+            if remaining == 0:
+                remaining = window
+                self.send(b'\x01')
+
+        self.send(b'\x04')
+        self.execute(bytes(command))
+
+    def modules(self, stdout: Any, stdin: Any) -> dict:
+        board = self
+
+        class uos:
+            sep = '/'
+
+            @staticmethod
+            def stat(filename):
+                s = os.stat(board.path(filename))
+                return (0x4000 if os.path.isdir(board.path(filename)) else 0x8000, 0, 0, 0, 0, 0, s.st_size, int(s.st_mtime), int(s.st_mtime), int(s.st_mtime))
+
+            @staticmethod
+            def ilistdir(dirname='/'):
+                for name in sorted(os.listdir(board.path(dirname))):
+                    filename = os.path.join(board.path(dirname), name)
+                    yield (name, 0x4000 if os.path.isdir(filename) else 0x8000, 0, os.path.getsize(filename))
+
+            @staticmethod
+            def listdir(dirname='/'):
+                return sorted(os.listdir(board.path(dirname)))
+
+            @staticmethod
+            def mkdir(dirname):
+                os.mkdir(board.path(dirname))
+
+            @staticmethod
+            def remove(filename):
+                if os.path.isdir(board.path(filename)):
+                    raise OSError(errno.EISDIR, 'EISDIR')
+
+                os.remove(board.path(filename))
+
+            @staticmethod
+            def rmdir(dirname):
+                os.rmdir(board.path(dirname))
+
+            @staticmethod
+            def rename(source, destination):
+                os.replace(board.path(source), board.path(destination))
+
+            @staticmethod
+            def uname():
+                return SimpleNamespace(machine='Emulated board with Picowatch', version='v1.22.0 (emulated)')
+
+        class micropython:
+            @staticmethod
+            def kbd_intr(c):
+                board.kbd_intr = c
+
+            @staticmethod
+            def const(value):
+                return value
+
+        class machine:
+            @staticmethod
+            def soft_reset():
+                raise SoftReset
+
+            @staticmethod
+            def bootloader():
+                raise SoftReset
+
+        class gc:
+            @staticmethod
+            def mem_free():
+                return 180000
+
+            @staticmethod
+            def mem_alloc():
+                return 20000
+
+            @staticmethod
+            def collect():
+                pass
+
+        class deflate:
+            RAW = -1
+            ZLIB = 1
+            GZIP = 2
+
+            class DeflateIO:
+                def __init__(self, stream, format=1, wbits=0):
+                    self.stream = io.BytesIO(zlib.decompress(stream.read(), {-1: -15, 1: 15, 2: 31}[format]))
+
+                def read(self, size=-1):
+                    return self.stream.read(size)
+
+                def readinto(self, buffer):
+                    return self.stream.readinto(buffer)
+
+        def print_exception(e, file=None):
+            stdout.write(f'{type(e).__name__}: {e}\n')
+
+        def start_new_thread(function, args):
+            threading.Thread(target=function, args=args, daemon=True).start()
+
+        usys = SimpleNamespace(stdout=stdout, stdin=stdin, platform='emulator', path=['', '/lib'], print_exception=print_exception, implementation=SimpleNamespace(name='micropython'))
+
+        return {
+            'os': uos, 'uos': uos, 'sys': usys, 'usys': usys, 'micropython': micropython, 'machine': machine, 'gc': gc,
+            'hashlib': hashlib, 'uhashlib': hashlib, 'binascii': binascii, 'ubinascii': binascii, 'json': json, 'ujson': json,
+            'time': time, 'utime': time, 'io': io, 'struct': struct, 'ustruct': struct, 'deflate': deflate, 'errno': errno,
+            '_thread': SimpleNamespace(start_new_thread=start_new_thread, allocate_lock=threading.Lock),
+        }
+
+    def execute(self, command: bytes, friendly: bool = False):
+        board = self
+
+        class stdout:
+            class buffer:
+                @staticmethod
+                def write(data):
+                    board.send(bytes(data))
+                    return len(data)
+
+            @staticmethod
+            def write(text):
+                if isinstance(text, (bytes, bytearray, memoryview)):
+                    text = bytes(text).decode('utf-8')
+
+                board.send(str(text).replace('\n', '\r\n'))
+                return len(text)
+
+        class stdin:
+            class buffer:
+                @staticmethod
+                def read(size):
+                    return bytes(board.getc() for _ in range(size))
+
+                @staticmethod
+                def readinto(buffer, size=None):
+                    size = len(buffer) if size is None else size
+
+                    for i in range(size):
+                        if (c := board.getc()) == 0x03 and board.kbd_intr == 3:
+                            raise KeyboardInterrupt
+
+                        buffer[i] = c
+
+                    return size
+
+            @staticmethod
+            def readline():
+                line = bytearray()
+
+                while not line.endswith(b'\n'):
+                    if (c := board.getc()) == 0x03 and board.kbd_intr == 3:
+                        raise KeyboardInterrupt
+
+                    line.append(c)
+
+                return line.decode('utf-8')
+
+        modules = self.modules(stdout, stdin)
+        scope = dict(vars(builtins))
+
+        def _import(name, globals=None, locals=None, fromlist=(), level=0):
+            if name in modules:
+                return modules[name]
+
+            return builtins.__import__(name, globals, locals, fromlist, level)
+
+        def _open(filename, mode='r', *args, **kwargs):
+            return open(board.path(filename), mode, *args, **kwargs)
+
+        def _print(*args, sep=' ', end='\n', file=None):
+            stdout.write(sep.join(str(arg) for arg in args) + end)
+
+        def _exec(source, globals=None, locals=None):
+            globals = {} if globals is None else globals
+            globals.setdefault('__builtins__', scope)
+
+            return exec(source, globals, locals)
+
+        scope.update({'__import__': _import, 'open': _open, 'print': _print, 'exec': _exec})
+        self.globals = self.globals or {'__name__': '__main__'}
+        self.globals['__builtins__'] = scope
+        exception = ''
+
+        try:
+            exec(compile(command.decode('utf-8'), '<stdin>', 'exec'), self.globals)
+        except SoftReset:
+            self.soft_reset()
+        except SystemExit:
+            raise
+        except BaseException as e:
+            exception = 'Traceback (most recent call last):\r\n'
+
+            for frame in traceback.extract_tb(e.__traceback__)[1:]:
+                exception += f'  File "{frame.filename}", line {frame.lineno}, in {frame.name}\r\n'
+
+            exception += f'{type(e).__name__}: {e}\r\n'
+
+        if not friendly:
+            self.send(b'\x04' + exception.encode('utf-8') + b'\x04>')
+        elif exception:
+            self.send(exception)
@@ -1,23 +1,54 @@
 #!/usr/bin/env python
 
+import io
 import os
 import sys
 import time
 import json
+import zlib
+import shutil
 import signal
+import threading
+import hashlib
+import operator
+import itertools
+import base64
+import codecs
+import array
+import struct
+import select
+import socket
+import ctypes
+import asyncio
+import selectors
 import tempfile
-import binascii
 import textwrap
 import mpy_cross
 import subprocess
+import ctypes.util
 
 from serial import Serial
+from queue import Queue
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from dotenv import dotenv_values
-from typing import List, Optional, Tuple, Union
+from typing import Any, BinaryIO, Callable, List, Optional, Set, Tuple, Union
 
 
 BUFFER_SIZE: int = 512
+READ_TIMEOUT: float = 3
+SESSION_IDLE: float = 10
+DELTA_BLOCK_SIZE: int = 1024
+DELTA_THRESHOLD: int = 8192
+COMPRESS_THRESHOLD: int = 1024
+COMPRESS_FRAME_SIZE: int = 8192
+COMPRESS_WBITS: int = 12
 LISTENING_TO: str = os.getcwd()
+CACHE_DIR: str = os.path.join(os.path.expanduser('~'), '.cache', 'picowatch')
+MPY_CACHE_DIR: str = os.path.join(CACHE_DIR, 'mpy')
+WATCH_INTERVAL: float = 0.1
+WATCH_DEBOUNCE: float = 0.2
+WATCH_SETTLE: float = 2
 
 
 class Tab():
@@ -31,7 +62,7 @@ class Tab():
         auto_size = nb_columns - len(self.colsize)
 
         if nb_columns > 0 and auto_size > 0:
-            terminal_size = os.get_terminal_size()
+            terminal_size = shutil.get_terminal_size()
             column_size = int((terminal_size.columns - sum(self.colsize) - 1) / auto_size)
 
             for i in range(len(self.colsize), nb_columns):
@@ -101,86 +132,299 @@ class Tab():
             self.border(border_style)
 
 
-class Telnet:
+class Socket(object):
+    timeout: float = 0.1
+    fifo: bytearray
 
-    def __init__(self, IP: str, login: str, password: str):
-        import telnetlib
-        from collections import deque
-
-        self.tn = telnetlib.Telnet(IP, timeout=15)
-        self.fifo = deque()
-
-        if b'Login as:' in self.tn.read_until(b'Login as:'):
-            self.tn.write(bytes(login, 'ascii') + b'\r\n')
-
-            if b'Password:' in self.tn.read_until(b'Password:'):
-                time.sleep(0.2)
-                self.tn.write(bytes(password, 'ascii') + b'\r\n')
-
-                if b'for more information.' in self.tn.read_until(b'Type "help()" for more information.'):
-                    return
-
-        raise Exception('Failed to establish a Telnet connection with the board')
+    def __init__(self, IP: str, port: int):
+        self.sock = socket.create_connection((IP, port), timeout=15)
+        self.sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        self.selector = selectors.DefaultSelector()
+        self.selector.register(self.sock, selectors.EVENT_READ)
+        self.fifo = bytearray()
+        self.chunk = bytearray(4096)
 
     def __del__(self):
         self.close()
 
     def close(self):
         try:
-            self.tn.close()
+            self.selector.close()
+            self.sock.close()
         except:
             pass
 
-    def read(self, size: int = 1) -> bytes:
-        timeout = 0
+    def feed(self, data: memoryview):
+        self.fifo.extend(data)
 
-        while len(self.fifo) < size and not timeout >= 8:
-            timeout = 0
-            data = self.tn.read_eager()
+    def fill(self, timeout: float) -> int:
+        # Wait for the socket to be readable, then take everything it holds in one call.
+        if not self.selector.select(timeout):
+            return 0
 
-            if len(data):
-                self.fifo.extend(data)
-                timeout = 0
-            else:
-                timeout += 1
-                time.sleep(0.25)
+        n = self.sock.recv_into(self.chunk)
+
+        if not n:
+            raise Exception('Connection closed by the board')
+
+        self.feed(memoryview(self.chunk)[:n])
+
+        return n
 
-        data = b''
+    def read_until(self, delimiter: bytes, timeout: float = 15) -> bytes:
+        deadline = time.monotonic() + timeout
 
-        while len(data) < size and len(self.fifo) > 0:
-            data += bytes([self.fifo.popleft()])
+        while delimiter not in self.fifo and time.monotonic() < deadline:
+            self.fill(deadline - time.monotonic())
+
+        i = self.fifo.find(delimiter)
+        i = len(self.fifo) if i < 0 else i + len(delimiter)
+        data = bytes(self.fifo[:i])
+        del self.fifo[:i]
+
+        return data
+
+    def read(self, size: int = 1) -> bytes:
+        deadline = time.monotonic() + self.timeout
+
+        while len(self.fifo) < size and (remaining := deadline - time.monotonic()) > 0:
+            self.fill(remaining)
+
+        data = bytes(self.fifo[:size])
+        del self.fifo[:size]
 
         return data
 
-    def write(self, data: bytes):
-        self.tn.write(data)
+    def write(self, data: bytes) -> int:
+        self.sock.sendall(data)
         return len(data)
 
     def inWaiting(self) -> int:
-        n_waiting = len(self.fifo)
+        while self.fill(0):
+            pass
+
+        return len(self.fifo)
+
+
+class Telnet(Socket):
+    iac: bytes = b''
+
+    def __init__(self, IP: str, login: str, password: str):
+        super().__init__(IP, 23)
 
-        if not n_waiting:
-            data = self.tn.read_eager()
+        if b'Login as:' in self.read_until(b'Login as:'):
+            self.write(bytes(login, 'ascii') + b'\r\n')
+
+            if b'Password:' in self.read_until(b'Password:'):
+                time.sleep(0.2)
+                self.write(bytes(password, 'ascii') + b'\r\n')
+
+                if b'for more information.' in self.read_until(b'Type "help()" for more information.'):
+                    return
+
+        raise Exception('Failed to establish a Telnet connection with the board')
+
+    def feed(self, data: memoryview):
+        # Telnet commands (IAC ...) are dropped and an escaped IAC IAC kept as a single 0xFF byte.
+        data = self.iac + bytes(data)
+        self.iac = b''
+
+        if b'\xff' not in data:
             self.fifo.extend(data)
-            n_waiting = len(data)
-        
-        return n_waiting
+            return
+
+        i = 0
+
+        while i < len(data):
+            if (j := data.find(b'\xff', i)) < 0:
+                self.fifo.extend(data[i:])
+                break
+
+            self.fifo.extend(data[i: j])
+
+            if j + 1 >= len(data) or (data[j + 1] in (251, 252, 253, 254) and j + 2 >= len(data)):
+                self.iac = data[j:]
+                break
+            elif data[j + 1] == 255:
+                self.fifo.append(255)
+                i = j + 2
+            elif data[j + 1] in (251, 252, 253, 254):
+                i = j + 3
+            else:
+                i = j + 2
+
+    def write(self, data: bytes) -> int:
+        self.sock.sendall(bytes(data).replace(b'\xff', b'\xff\xff'))
+        return len(data)
+
+
+class WebREPL(Socket):
+    frame: bytearray
+    binary: bytearray
+
+    def __init__(self, url: str, password: str):
+        host = url[len('ws://'):].strip('/')
+        IP, _, port = host.partition(':')
+        super().__init__(IP, int(port or 8266))
+        self.frame = bytearray()
+        self.binary = bytearray()
+        key = base64.b64encode(os.urandom(16)).decode('ascii')
+        self.sock.sendall(f'GET / HTTP/1.1\r\nHost: {host}\r\nConnection: Upgrade\r\nUpgrade: websocket\r\nSec-WebSocket-Key: {key}\r\n\r\n'.encode('ascii'))
+        deadline = time.monotonic() + 15
+
+        # The HTTP answer is read straight from the socket, websocket frames only start after it.
+        while not self.frame.endswith(b'\r\n\r\n') and time.monotonic() < deadline:
+            if self.selector.select(deadline - time.monotonic()):
+                self.frame.extend(self.sock.recv(1))
+
+        if b' 101 ' not in self.frame:
+            raise Exception('Failed to establish a WebREPL connection with the board')
+
+        self.frame.clear()
+
+        if b'Password:' in self.read_until(b'Password:'):
+            self.write(bytes(password, 'ascii') + b'\r')
+
+            if b'WebREPL connected' in self.read_until(b'WebREPL connected'):
+                return
+
+        raise Exception('Failed to log in the WebREPL, check the password')
+
+    def feed(self, data: memoryview):
+        # REPL output comes in text frames, the file transfer protocol in binary frames.
+        self.frame.extend(data)
+
+        while len(self.frame) >= 2:
+            opcode, size = self.frame[0] & 0x0f, self.frame[1] & 0x7f
+            offset = 2
+
+            if size == 126:
+                if len(self.frame) < 4:
+                    return
+
+                size, offset = struct.unpack('>H', self.frame[2:4])[0], 4
+
+            if len(self.frame) < offset + size:
+                return
+
+            if opcode == 0x1:
+                self.fifo.extend(self.frame[offset: offset + size])
+            elif opcode == 0x2:
+                self.binary.extend(self.frame[offset: offset + size])
+            elif opcode == 0x8:
+                raise Exception('Connection closed by the board')
+
+            del self.frame[:offset + size]
+
+    def send(self, data: bytes, opcode: int = 0x1):
+        for i in range(0, max(len(data), 1), 0xffff):
+            chunk = data[i: i + 0xffff]
+
+            if len(chunk) < 126:
+                header = struct.pack('>BB', 0x80 | opcode, len(chunk))
+            else:
+                header = struct.pack('>BBH', 0x80 | opcode, 126, len(chunk))
+
+            self.sock.sendall(header + chunk)
+
+    def write(self, data: bytes) -> int:
+        self.send(bytes(data))
+        return len(data)
+
+    def receive(self, size: int, timeout: float = READ_TIMEOUT) -> bytes:
+        deadline = time.monotonic() + timeout
+
+        while len(self.binary) < size and time.monotonic() < deadline:
+            self.fill(deadline - time.monotonic())
+
+        if len(self.binary) < size:
+            raise Exception('WebREPL: timeout waiting for the board')
+
+        data = bytes(self.binary[:size])
+        del self.binary[:size]
+
+        return data
+
+    def response(self):
+        signature, code = struct.unpack('<2sH', self.receive(4))
+
+        if signature != b'WB' or code != 0:
+            raise Exception(f'WebREPL: the board refused the transfer (code: {code})')
+
+    def request(self, opcode: int, filename: str, size: int = 0):
+        filename = filename.encode('utf-8')
+        self.binary.clear()
+        self.send(struct.pack('<2sBBQLH64s', b'WA', opcode, 0, 0, size, len(filename), filename), 0x2)
+        self.response()
+
+    def put(self, filename: str, data: bytes, callback: Optional[Callable[[], None]] = None):
+        # WA opcode 1: the board answers WB 0, takes the raw file contents, then answers WB 0 once written.
+        self.request(1, filename, len(data))
+
+        for i in range(0, len(data), 1024):
+            self.send(data[i: i + 1024], 0x2)
+
+            if callback:
+                callback()
+
+        self.response()
+
+    def get(self, filename: str, write: Callable[[bytes], Any], callback: Optional[Callable[[], None]] = None):
+        # WA opcode 2: after WB 0, every \x00 we send is answered with a length-prefixed chunk, an empty one ends the file.
+        self.request(2, filename)
+
+        while True:
+            self.send(b'\x00', 0x2)
+
+            if not (size := struct.unpack('<H', self.receive(2))[0]):
+                break
+
+            write(self.receive(size))
+
+            if callback:
+                callback()
+
+        self.response()
 
 
 class Pyboard(object):
     i: int = 0
     boot_status: bool = False
-    serial: Union[Serial, Telnet]
+    use_raw_paste: bool = True
+    raw_repl: bool = False
+    last_seen: float = 0
+    quiet: bool = False
+    bytes_in: int = 0
+    bytes_out: int = 0
+    round_trips: int = 0
+    handshakes: int = 0
+    handshake_time: float = 0
+    tracking: Optional[Tuple[float, int, int]] = None
+    device: str
+    serial: Union[Serial, Telnet, WebREPL, Any]
+    buffer: bytearray
 
     def __init__(self, device: str, baudrate: int = 115200, login: str = 'micro', password: str = 'python'):
-        is_telnet = device and device.count('.') == 3
+        is_emulator = device and device.startswith('emulator://')
+        is_webrepl = device and device.startswith('ws://')
+        is_telnet = device and device.count('.') == 3 and not is_webrepl and not is_emulator
+        self.device = device
+        self.buffer = bytearray()
 
         for _ in range(0, 3):
             try:
-                if is_telnet:
+                if is_emulator:
+                    # emulator://<directory>[?latency=<seconds>] runs a simulated board throttled to the baudrate.
+                    from emulator import Emulator
+
+                    root, _, latency = device[len('emulator://'):].partition('?latency=')
+                    self.serial = Emulator(root, baudrate, latency or 0)
+                elif is_webrepl:
+                    self.serial = WebREPL(device, password)
+                elif is_telnet:
                     self.serial = Telnet(device, login, password)
                 else:
-                    self.serial = Serial(device, baudrate=baudrate, interCharTimeout=1)
+                    self.serial = Serial(device, baudrate=baudrate, timeout=0.1, interCharTimeout=1)
                 break
             except:
                 time.sleep(1)
@@ -188,71 +432,134 @@ class Pyboard(object):
             raise Exception(f'Failed to access device: {device}')
 
     def close(self):
+        self.send_ctrl_b()
         self.serial.close()
 
-    def transfer_status(self) -> int:
+    def track(self, expected: int = 0):
+        # Live throughput is measured from here on, with a percentage and an ETA when the expected bytes are known.
+        self.tracking = (time.monotonic(), self.bytes_in + self.bytes_out, expected)
+
+    def transfer_status(self):
+        if self.quiet:
+            return
+
         arrows = ['◜', '◝', '◞', '◟']
-        sys.stdout.write(f'[∘] Transfering... {arrows[self.i]}\r')
+        status = f'[∘] Transfering... {arrows[self.i]}'
+
+        if self.tracking and (elapsed := time.monotonic() - self.tracking[0]) > 0:
+            start, moved, expected = self.tracking
+            moved = self.bytes_in + self.bytes_out - moved
+            status += f' {round(moved / elapsed / 1024, 2)} kb/s'
+
+            if expected > 0 and moved > 0:
+                status += f', {min(100, round(100 * moved / expected))}%, ETA: {round(max(0, expected - moved) * elapsed / moved)} s'
+
+        sys.stdout.write(status.ljust(64) + '\r')
         sys.stdout.flush()
         self.i = (self.i + 1) % 4      
 
+    def write(self, data: bytes) -> int:
+        self.bytes_out += len(data)
+
+        return self.serial.write(data)
+
     def send_ok(self) -> bytes:
-        self.serial.write(b'\x04')
+        self.write(b'\x04')
         return b'OK'
 
     def send_ctrl_a(self) -> bytes:
         # Ctrl-A on a blank line will enter raw REPL mode. This is like a permanent paste mode, except that characters are not echoed back.
-        self.serial.write(b'\x01')
+        self.write(b'\x01')
         return b'raw REPL; CTRL-B to exit\r\n>'
 
     def send_ctrl_b(self):
+        self.raw_repl = False
         # Ctrl-B on a blank like goes to normal REPL mode.
-        self.serial.write(b'\x02')
+        self.write(b'\x02')
 
     def send_ctrl_c(self) -> bytes:
         self.boot_status = False
+        self.raw_repl = False
         # Ctrl-C cancels any input, or interrupts the currently running code.
         for _ in range(0, 2):
-            self.serial.write(b'\x03')
+            self.write(b'\x03')
 
         return b'raw REPL; CTRL-B to exit\r\n'
 
     def send_ctrl_d(self) -> bytes:
+        self.raw_repl = False
         # Ctrl-D on a blank line will do a soft reset.
-        self.serial.write(b'\x04')
+        self.write(b'\x04')
         return b'soft reboot\r\n'
 
     def until_nothing_in_waiting(self):
+        self.buffer.clear()
         n = self.serial.inWaiting()
 
         while n > 0:
-            self.serial.read(n)
+            self.bytes_in += len(self.serial.read(n))
             n = self.serial.inWaiting()        
 
-    def read_until(self, delimiter: bytes, stream_output: bool = False, show_status: bool = False) -> Optional[bytes]:
-        data = b''
-        timeout = 300
-        max_len = len(delimiter)
+    def receive(self) -> int:
+        # Drain everything already waiting in one call, otherwise block on the port (up to its timeout) for the next byte.
+        data = self.serial.read(max(1, self.serial.inWaiting()))
+        self.buffer.extend(data)
+        self.bytes_in += len(data)
+
+        return len(data)
+
+    def read_until(self, delimiter: bytes, stream_output: bool = False, show_status: bool = False, timeout: float = READ_TIMEOUT) -> Optional[bytes]:
+        start = 0
+        deadline = time.monotonic() + timeout
         
-        while timeout > 0:
-            if data.endswith(delimiter):
-                return data
-            elif self.serial.inWaiting() > 0:
-                timeout = 300
-                data += self.serial.read(1)
+        while True:
+            if (i := self.buffer.find(delimiter, start)) >= 0:
+                i += len(delimiter)
+                data = bytes(self.buffer[:i])
+                del self.buffer[:i]
 
                 if stream_output:
-                    sys.stdout.buffer.write(data[:-1])
+                    sys.stdout.buffer.write(data[:-len(delimiter)])
                     sys.stdout.buffer.flush()
-                    data = data[-max_len:]
-                elif show_status:
+                    return delimiter
+
+                return data
+
+            if stream_output and len(self.buffer) >= len(delimiter):
+                # Keep only what could still be the beginning of the delimiter.
+                n = len(self.buffer) - len(delimiter) + 1
+                sys.stdout.buffer.write(self.buffer[:n])
+                sys.stdout.buffer.flush()
+                del self.buffer[:n]
+
+            start = max(0, len(self.buffer) - len(delimiter) + 1)
+
+            if self.receive():
+                deadline = time.monotonic() + timeout
+
+                if show_status:
                     self.transfer_status()
-            else:
-                timeout -= 1
-                time.sleep(0.01)
+            elif time.monotonic() > deadline:
+                return None
+
+    def read_exactly(self, size: int, timeout: float = READ_TIMEOUT) -> bytes:
+        deadline = time.monotonic() + timeout
+
+        while len(self.buffer) < size:
+            if self.receive():
+                deadline = time.monotonic() + timeout
+            elif time.monotonic() > deadline:
+                break
+
+        data = bytes(self.buffer[:size])
+        del self.buffer[:size]
+
+        return data
 
     def boot(self):
-        data = b''
+        tail = b''
+        # main.py only runs on a soft reset from the normal REPL.
+        self.send_ctrl_b()
         self.send_ctrl_c()
         self.until_nothing_in_waiting()
         time.sleep(.5)
@@ -264,10 +571,20 @@ class Pyboard(object):
         self.boot_status = True
 
         while self.boot_status and output_status:
-            if self.serial.inWaiting():
-                sys.stdout.buffer.write((data := data[-15:] + self.serial.read(1))[-1:])
+            if self.buffer or self.receive():
+                data = bytes(self.buffer)
+                self.buffer.clear()
+                window = tail + data
+
+                for marker in [b'\r\nMicroPython v', b'.\r\n>>>']:
+                    if (i := window.find(marker)) >= 0:
+                        data = data[:max(0, i + len(marker) - len(tail))]
+                        output_status = False
+                        break
+
+                sys.stdout.buffer.write(data)
                 sys.stdout.buffer.flush()
-                output_status = not data.endswith(b'\r\nMicroPython v') and not data.endswith(b'.\r\n>>>')
+                tail = window[-15:]
         
         if not output_status:
             sys.stdout.buffer.write(b'\r<<< Program terminated\r\n')
@@ -277,6 +594,13 @@ class Pyboard(object):
         self.boot_status = False
 
     def __enter__(self):
+        # The raw-REPL session stays open between commands, as long as nothing unexpected came in meanwhile
+        # and, after a while without traffic, the board still answers a Ctrl-A with the raw REPL prompt.
+        if self.raw_repl and not self.buffer and not self.serial.inWaiting():
+            if time.monotonic() - self.last_seen < SESSION_IDLE or self.read_until(self.send_ctrl_a()):
+                return self.__terminal
+
+        start = time.monotonic()
         self.send_ctrl_c()
         self.until_nothing_in_waiting()
 
@@ -288,26 +612,103 @@ class Pyboard(object):
         else:
             raise Exception('Terminal: could not enter raw-REPL mode')
 
+        self.raw_repl = True
+        self.last_seen = time.monotonic()
+        self.handshakes += 1
+        self.handshake_time += self.last_seen - start
+
         return self.__terminal
 
     def __exit__(self, a, b, c):
-        self.send_ctrl_b()
+        pass
+
+    def raw_paste(self, command: bytes, show_status: bool = False) -> bool:
+        if not self.use_raw_paste:
+            return False
+
+        # Ctrl-E + A + Ctrl-A in raw REPL mode asks for raw-paste mode: the board answers R\x01 when supported, R\x00 when refused.
+        self.write(b'\x05A\x01')
+        response = self.read_exactly(2)
+
+        if response == b'R\x00':
+            self.use_raw_paste = False
+            return False
+        elif response != b'R\x01':
+            # Older firmware does not know raw-paste mode and only reprints the raw REPL banner.
+            self.use_raw_paste = False
+
+            if not self.read_until(b'w REPL; CTRL-B to exit\r\n>'):
+                raise Exception('Terminal: could not fall back to raw-REPL mode')
+
+            return False
+
+        # The board then gives its window size: we may only send that many bytes until it acknowledges them with \x01.
+        window_size = struct.unpack('<H', self.read_exactly(2))[0]
+        window = window_size
+        i = 0
+
+        while i < len(command):
+            while window == 0 or self.serial.inWaiting() > 0:
+                flag = self.read_exactly(1)
+
+                if flag == b'\x01':
+                    window += window_size
+                elif flag == b'\x04':
+                    # The board ended the paste on its own (e.g. out of memory), the error will follow as output.
+                    self.write(b'\x04')
+                    return True
+                else:
+                    raise Exception(f'Terminal: unexpected flow control during raw-paste: {flag}')
+
+            chunk = command[i: i + window]
+            self.write(chunk)
+            window -= len(chunk)
+            i += len(chunk)
+
+            if show_status:
+                self.transfer_status()
+
+        self.write(b'\x04')
+
+        if not self.read_until(b'\x04'):
+            raise Exception('Terminal: could not complete raw-paste')
+
+        return True
 
-    def __terminal(self, command: str, stream_output: bool = False) -> Optional[str]:
+    def __terminal(self, command: str, stream_output: bool = False, transfer: Optional[Callable[[], bool]] = None) -> Optional[str]:
         command = textwrap.dedent(command) 
 
         if not isinstance(command, bytes):
             command = bytes(command, encoding='utf-8')
 
-        for i in range(0, len(command), BUFFER_SIZE):
-            if not stream_output:
-                self.transfer_status()
+        # Until the prompt comes back, the session can not be trusted for the next command.
+        self.raw_repl = False
+        self.round_trips += 1
+
+        if not self.raw_paste(command, show_status=not stream_output):
+            for i in range(0, len(command), BUFFER_SIZE):
+                if not stream_output:
+                    self.transfer_status()
+
+                self.write(command[i: min(i + BUFFER_SIZE, len(command))])
+                time.sleep(0.0001)
+
+            if not self.read_until(self.send_ok()):
+                raise Exception('Terminal: could not execute command')
+
+        # Once the command runs, transfer() may exchange raw bytes with it over stdin/stdout, it returns False if the board stopped early.
+        transferred = not transfer or transfer()
+        self.tracking = None
 
-            self.serial.write(command[i: min(i + BUFFER_SIZE, len(command))])
-            time.sleep(0.0001)
+        # The board stopped before taking everything: what it printed is dropped, its exception tells why it stopped.
+        if not transferred:
+            if (rest := self.read_until(b'\x04>')):
+                self.raw_repl = True
+                self.last_seen = time.monotonic()
 
-        if not self.read_until(self.send_ok()):
-            raise Exception('Terminal: could not execute command')
+            reason = (rest or b'')[:-2].split(b'\x04')[-1].decode('utf-8', 'replace').strip().split('\n')[-1].strip()
+
+            raise Exception(f'Terminal: the board aborted the transfer{": " + reason if reason else ""}')
 
         data = self.read_until(b'\x04', stream_output=stream_output, show_status=not stream_output)
 
@@ -321,6 +722,11 @@ class Pyboard(object):
             self.send_ctrl_d()
             raise Exception('Terminal: timeout waiting for second EOF reception')
 
+        # Wait for the raw REPL prompt so the next command starts on a clean line.
+        if self.read_until(b'>'):
+            self.raw_repl = True
+            self.last_seen = time.monotonic()
+
         data, exception = (data[:-1].decode('utf-8'), exception[:-1].decode('utf-8'))
 
         if exception:
@@ -338,271 +744,1262 @@ class Pyboard(object):
         return data.strip()
 
 
+class Telemetry(object):
+    format: str = ''
+    path: str = ''
+    lock: threading.Lock = threading.Lock()
+    pyboard: Pyboard
+    command: str = ''
+    files: List[dict]
+
+    def __init__(self, pyboard: Pyboard):
+        self.pyboard = pyboard
+        self.begin()
+
+    def counters(self) -> Tuple[int, int, int, int, float]:
+        pyboard = self.pyboard
+
+        return (pyboard.bytes_in, pyboard.bytes_out, pyboard.round_trips, pyboard.handshakes, pyboard.handshake_time)
+
+    def begin(self, command: str = ''):
+        self.command = command
+        self.files = []
+        self.started = time.time()
+        self.start = time.monotonic()
+        self.snapshot = self.counters()
+
+    def record(self, filename: str, size: int, wire: int, seconds: float, checksum: str):
+        self.files.append({
+            'filename': filename.strip('/'),
+            'size': size,
+            'wire': wire,
+            'seconds': round(seconds, 4),
+            'throughput': round(wire / seconds) if seconds > 0 else 0,
+            'checksum': checksum,
+        })
+
+    def report(self) -> dict:
+        seconds = time.monotonic() - self.start
+        bytes_in, bytes_out, round_trips, handshakes, handshake_time = [now - then for now, then in zip(self.counters(), self.snapshot)]
+
+        return {
+            'command': self.command,
+            'device': self.pyboard.device,
+            'agent': AGENT_VERSION,
+            'started': time.strftime('%Y-%m-%dT%H:%M:%S', time.localtime(self.started)),
+            'seconds': round(seconds, 4),
+            'bytes_in': bytes_in,
+            'bytes_out': bytes_out,
+            'throughput': round((bytes_in + bytes_out) / seconds) if seconds > 0 else 0,
+            'round_trips': round_trips,
+            'handshakes': handshakes,
+            'handshake_seconds': round(handshake_time, 4),
+            'files': self.files,
+        }
+
+    def end(self) -> dict:
+        report = self.report()
+        self.begin()
+
+        # Commands that never talked to the board (help, status...) leave no report.
+        if not self.format or not (report['bytes_in'] or report['bytes_out']):
+            return report
+
+        # json keeps the report of the last command, ndjson appends one line per command.
+        with self.lock:
+            if self.format == 'json':
+                with open(self.path, 'w') as fh:
+                    json.dump(report, fh, indent=4)
+            else:
+                with open(self.path, 'a') as fh:
+                    fh.write(json.dumps(report) + '\n')
+
+        return report
+
+
+AGENT_VERSION: int = 6
+AGENT_NAME: str = f'_pw{AGENT_VERSION}'
+
+# Board side helpers, injected once per raw-REPL session: every FileSystem operation is then a one-line call to it.
+AGENT: str = f"""
+import io
+import sys
+import json
+import struct
+import micropython
+try:
+    import os
+    import hashlib
+    import binascii
+except ImportError:
+    import uos as os
+    import uhashlib as hashlib
+    import ubinascii as binascii
+
+
+class PicowatchReader:
+
+    def __init__(self, b, m):
+        self.b = b
+        self.m = m
+        self.i = self.k = 0
+        micropython.kbd_intr(-1)
+        sys.stdout.write('\\x01')
+        self.n = struct.unpack('<I', sys.stdin.buffer.read(4))[0]
+
+    def more(self):
+        return self.i < self.k or self.n > 0
+
+    def fill(self):
+        if self.n == 0:
+            raise EOFError
+        self.k = min(self.n, len(self.b))
+        self.i = 0
+        self.n -= self.k
+        sys.stdout.write('\\x01')
+        sys.stdin.buffer.readinto(self.m[:self.k])
+
+    def readinto(self, buf):
+        j = 0
+        while j < len(buf):
+            if self.i == self.k:
+                self.fill()
+            k = min(len(buf) - j, self.k - self.i)
+            buf[j:j + k] = self.m[self.i:self.i + k]
+            self.i += k
+            j += k
+        return j
+
+    def read(self, size, out=None):
+        if not out:
+            b = bytearray(size)
+            self.readinto(b)
+            return bytes(b)
+        while size > 0:
+            if self.i == self.k:
+                self.fill()
+            k = min(size, self.k - self.i)
+            out(self.m[self.i:self.i + k])
+            self.i += k
+            size -= k
+
+
+class PicowatchAgent:
+
+    def __init__(self):
+        self.b = bytearray({BUFFER_SIZE})
+        self.m = memoryview(self.b)
+
+    def x(self, name, *args):
+        try:
+            print(json.dumps(getattr(self, name)(*args)))
+        finally:
+            micropython.kbd_intr(3)
+
+    def supports(self, module):
+        try:
+            __import__(module)
+            return 1
+        except ImportError:
+            return 0
+
+    def digest(self, filename):
+        h = hashlib.sha256()
+        with open(filename, 'rb') as fh:
+            while (n := fh.readinto(self.b)):
+                h.update(self.m[:n])
+        return binascii.hexlify(h.digest()).decode()
+
+    def walk(self, dirname):
+        e = []
+        s = os.stat(dirname)
+        if s[0] == 0x4000:
+            if not dirname.endswith('/'):
+                dirname += '/'
+            e.append((dirname, -1))
+            for t in os.ilistdir(dirname):
+                if dirname.startswith('/'):
+                    dirname = dirname[1:]
+                if t[1] == 0x4000:
+                    e.extend(self.walk(dirname + t[0] + '/'))
+                else:
+                    e.append((dirname + t[0], os.stat(dirname + t[0])[6]))
+        else:
+            e.append((dirname, s[6]))
+        return e
+
+    def ls(self, dirname):
+        try:
+            return [1, sorted(self.walk(dirname)), '']
+        except Exception as e:
+            return [0, [(dirname, -2)], str(e)]
+
+    def rm(self, filename):
+        try:
+            r = []
+            if os.stat(filename)[0] == 0x4000:
+                e = sorted(self.walk(filename)[1:], reverse=True)
+                if filename != '/':
+                    e.append((filename.strip('/'), -1))
+                for f, s in e:
+                    if not s == -1:
+                        try:
+                            os.remove(f)
+                            r.append((f, 1, ''))
+                        except Exception as e:
+                            r.append((f, 0, str(e)))
+                for f, s in e:
+                    if s == -1:
+                        try:
+                            os.rmdir(f)
+                            r.append((f, 1, ''))
+                        except Exception as e:
+                            r.append((f, 0, str(e)))
+            else:
+                os.remove(filename)
+                r.append((filename, 1, ''))
+            return [1, r, '']
+        except Exception as e:
+            return [0, [(filename, 0, str(e))], str(e)]
+
+    def unlink(self, filenames):
+        r = []
+        for f in filenames:
+            try:
+                os.remove(f)
+                r.append(f)
+            except OSError:
+                pass
+        return r
+
+    def mkdirs(self, dirnames):
+        r = []
+        for d in dirnames:
+            try:
+                os.mkdir(d)
+                r.append((d, 1))
+            except OSError as e:
+                if e.args[0] == 17:
+                    r.append((d, 1))
+                else:
+                    r.append((d, 0, str(e)))
+        return r
+
+    def manifest(self, dirname):
+        def walk(dirname):
+            for t in os.ilistdir(dirname or '/'):
+                if t[0].startswith('.'):
+                    continue
+                filename = dirname + '/' + t[0] if dirname else t[0]
+                if t[1] == 0x4000:
+                    walk(filename)
+                else:
+                    print(filename, os.stat(filename)[6], self.digest(filename), sep='\\t')
+        try:
+            if not dirname or os.stat(dirname)[0] == 0x4000:
+                walk(dirname)
+            else:
+                print(dirname, os.stat(dirname)[6], self.digest(dirname), sep='\\t')
+        except OSError:
+            pass
+
+    def blocks(self, filename, block_size):
+        try:
+            size = os.stat(filename)[6]
+        except OSError:
+            return [-1, [], []]
+        r = []
+        w = []
+        b = bytearray(block_size)
+        m = memoryview(b)
+        with open(filename, 'rb') as fh:
+            while (n := fh.readinto(b)):
+                r.append(binascii.hexlify(hashlib.sha256(m[:n]).digest()[:8]).decode())
+                q = n >> 2
+                w.append([sum(m[:q]), sum(m[q:2 * q]), sum(m[2 * q:3 * q]), sum(m[3 * q:n])])
+        return [size, r, w]
+
+    def send(self, filename):
+        h = hashlib.sha256()
+        with open(filename, 'rb') as fh:
+            while True:
+                n = fh.readinto(self.b)
+                sys.stdout.buffer.write(struct.pack('<BH', 1, n))
+                if not n:
+                    break
+                h.update(self.m[:n])
+                sys.stdout.buffer.write(self.m[:n])
+        return binascii.hexlify(h.digest()).decode()
+
+    def receive(self, filename, compressed):
+        r = PicowatchReader(self.b, self.m)
+        h = hashlib.sha256()
+        with open(filename, 'wb') as fh:
+            def write(chunk):
+                fh.write(chunk)
+                h.update(chunk)
+            if compressed:
+                import deflate
+                b = bytearray({BUFFER_SIZE})
+                m = memoryview(b)
+                while r.more():
+                    frame = bytearray(struct.unpack('<H', r.read(2))[0])
+                    r.readinto(frame)
+                    f = deflate.DeflateIO(io.BytesIO(frame), deflate.RAW, {COMPRESS_WBITS})
+                    while (n := f.readinto(b)):
+                        write(m[:n])
+            else:
+                r.read(r.n, write)
+        return binascii.hexlify(h.digest()).decode()
+
+    def patch(self, filename, block_size):
+        r = PicowatchReader(self.b, self.m)
+        h = hashlib.sha256()
+        b = bytearray(block_size)
+        m = memoryview(b)
+        with open(filename, 'rb') as src, open(filename + '.part', 'wb') as dst:
+            def write(chunk):
+                dst.write(chunk)
+                h.update(chunk)
+            while r.more():
+                op, v = struct.unpack('<BI', r.read(5))
+                if op == 67:
+                    src.seek(v * block_size)
+                    write(m[:src.readinto(b)])
+                else:
+                    r.read(v, write)
+        try:
+            os.rename(filename + '.part', filename)
+        except OSError:
+            os.remove(filename)
+            os.rename(filename + '.part', filename)
+        return binascii.hexlify(h.digest()).decode()
+
+    def unpack(self):
+        r = PicowatchReader(self.b, self.m)
+        o = []
+        while r.more():
+            k, mode, size = struct.unpack('<HHI', r.read(8))
+            filename = r.read(k).decode()
+            if mode == 0x4000:
+                try:
+                    os.mkdir(filename)
+                    o.append((filename, 1, ''))
+                except OSError as e:
+                    o.append((filename, 1 if e.args[0] == 17 else 0, str(e)))
+                continue
+            h = hashlib.sha256()
+            try:
+                fh = open(filename, 'wb')
+            except OSError as e:
+                r.read(size, lambda chunk: None)
+                o.append((filename, 0, str(e)))
+                continue
+            with fh:
+                def write(chunk):
+                    fh.write(chunk)
+                    h.update(chunk)
+                r.read(size, write)
+            o.append((filename, 1, binascii.hexlify(h.digest()).decode()))
+        return o
+
+    def pack(self, dirname):
+        w = sys.stdout.buffer.write
+        n = 0
+        for filename, size in self.walk(dirname):
+            p = filename.encode()
+            w(b'\x01' + struct.pack('<HHI', len(p), 0x4000 if size == -1 else 0x8000, max(size, 0)) + p)
+            if size != -1:
+                w(binascii.unhexlify(self.send(filename)))
+                n += 1
+        w(b'\x01' + struct.pack('<HHI', 0, 0, 0))
+        return n
+
+    def mem(self):
+        import gc
+        gc.collect()
+        return [gc.mem_free(), gc.mem_alloc()]
+
+    def out(self, *args, **kwargs):
+        with self.lock:
+            if self.done:
+                raise SystemExit
+            print(*args, **kwargs)
+
+    def run(self, filename):
+        try:
+            with open(filename, 'r') as fh:
+                exec(fh.read(), {{'__name__': '__main__', 'print': self.out}})
+        except Exception as e:
+            with self.lock:
+                sys.print_exception(e)
+
+    def serve(self, filename):
+        import _thread
+        self.lock = _thread.allocate_lock()
+        self.done = False
+        _thread.start_new_thread(self.run, (filename,))
+        try:
+            while True:
+                name, *args = json.loads(sys.stdin.readline())
+                try:
+                    r = [1, getattr(self, name)(*args)]
+                except Exception as e:
+                    r = [0, str(e)]
+                r = '\\x1e' + json.dumps(r) + '\\x1f'
+                with self.lock:
+                    sys.stdout.write(r)
+        finally:
+            with self.lock:
+                self.done = True
+
+
+{AGENT_NAME} = PicowatchAgent()
+"""
+
+
+class Transport(object):
+    pyboard: Pyboard
+    subscribers: List[Callable[[bytes], None]]
+    replies: deque
+    loop: Optional[asyncio.AbstractEventLoop] = None
+    thread: Optional[threading.Thread] = None
+    stopping: threading.Event
+    ended: bool = False
+
+    def __init__(self, pyboard: Pyboard):
+        self.pyboard = pyboard
+        self.subscribers = []
+        self.replies = deque()
+        self.stopping = threading.Event()
+
+    def subscribe(self, callback: Callable[[bytes], None]):
+        self.subscribers.append(callback)
+
+    def publish(self, data: bytes):
+        if data:
+            for callback in self.subscribers:
+                callback(data)
+
+    async def reader(self):
+        loop = asyncio.get_running_loop()
+        pending = b''
+        framing = False
+
+        # Replies to queries come framed by \x1e...\x1f, everything else the board prints goes to the subscribers,
+        # until the \x04 that ends the command: what follows is left in the buffer for the raw REPL. The port is read
+        # with its own short timeout, so a stop request is seen between two reads.
+        try:
+            while not self.stopping.is_set():
+                await loop.run_in_executor(None, self.pyboard.receive)
+                pending += bytes(self.pyboard.buffer)
+                self.pyboard.buffer.clear()
+
+                while pending:
+                    if framing:
+                        if (i := pending.find(b'\x1f')) < 0:
+                            break
+
+                        if self.replies and not (reply := self.replies.popleft()).done():
+                            reply.set_result(json.loads(pending[:i]))
+
+                        pending = pending[i + 1:]
+                        framing = False
+                        continue
+
+                    i = pending.find(b'\x1e')
+                    j = pending.find(b'\x04')
+
+                    if j >= 0 and (i < 0 or j < i):
+                        self.publish(pending[:j])
+                        pending = pending[j:]
+                        self.ended = True
+
+                        return
+
+                    if i < 0:
+                        self.publish(pending)
+                        pending = b''
+                    else:
+                        self.publish(pending[:i])
+                        pending = pending[i + 1:]
+                        framing = True
+        finally:
+            self.pyboard.buffer[:0] = pending
+
+            for reply in self.replies:
+                reply.cancel()
+
+    def main(self):
+        try:
+            self.loop.run_until_complete(self.reader())
+        finally:
+            self.loop.run_until_complete(self.loop.shutdown_default_executor())
+            self.loop.close()
+
+    async def call(self, name: str, *args) -> Any:
+        future = asyncio.get_running_loop().create_future()
+        self.replies.append(future)
+        self.pyboard.write(json.dumps([name, *args]).encode('utf-8') + b'\n')
+        status, output = await asyncio.wait_for(future, READ_TIMEOUT)
+
+        if not status:
+            raise Exception(output)
+
+        return output
+
+    def start(self):
+        # The event loop runs next to the console, which stays free to send queries while the output is routed.
+        self.loop = asyncio.new_event_loop()
+        self.thread = threading.Thread(target=self.main, daemon=True)
+        self.thread.start()
+
+    def alive(self) -> bool:
+        return bool(self.thread and self.thread.is_alive())
+
+    def request(self, name: str, *args) -> Any:
+        return asyncio.run_coroutine_threadsafe(self.call(name, *args), self.loop).result(READ_TIMEOUT * 2)
+
+    def stop(self):
+        if self.thread:
+            # The reader returns on the \x04 that ends the program, a board that never sends it is given up on: the
+            # reader is told to stop and joined, so no thread is left reading the port once the console takes it back.
+            self.thread.join(READ_TIMEOUT * 2)
+            self.stopping.set()
+            self.thread.join()
+
+            if not self.ended:
+                raise Exception('Transport: timeout waiting for the board to leave the program')
+
+
 class FileSystem(object):
     pyboard: Pyboard
+    compression: bool = False
+    agent: bool = False
+    modules: dict
+    directories: set
+    telemetry: Telemetry
 
     def __init__(self, pyboard: Pyboard):
         self.pyboard = pyboard
+        self.modules = {}
+        self.directories = set()
+        self.telemetry = Telemetry(pyboard)
 
-    def checksum(self, source: str, data: str) -> str:
-        output = self.terminal(f"""
-            def checksum(data):
-                v = 21
-                for c in data.decode('utf-8'):
-                    v ^= ord(c)
-                return v
-            
-            with open('{source}', 'rb') as fh:
-                print(checksum(fh.read()))
-        """)
+    def forget(self):
+        # After a reset (or a program that ran meanwhile) neither the agent nor the known directories can be trusted.
+        self.agent = False
+        self.directories = set()
 
-        if isinstance(data, bytes):
-            data = data.decode('utf-8')
+    def request(self, name: str, *args) -> str:
+        return f'{AGENT_NAME}.x({", ".join([repr(name)] + [repr(arg) for arg in args])})'
+
+    def call(self, name: str, *args, transfer: Optional[Callable[[], bool]] = None) -> Tuple[str, Any]:
+        if not self.agent:
+            self.terminal(AGENT)
+            self.agent = True
+
+        try:
+            output = self.terminal(self.request(name, *args), transfer=transfer)
+        except Exception as e:
+            # A soft reset we did not see coming wiped the agent from the board.
+            if 'NameError' not in str(e) or AGENT_NAME not in str(e):
+                raise e
 
-        v = 21
-        for c in data:
-            v ^= ord(c)
+            self.forget()
+            return self.call(name, *args, transfer=transfer)
 
-        if int(v) == int(output):
+        # Anything printed before the last line (e.g. the manifest) is handed back as it is.
+        *lines, result = output.split('\n')
+
+        return ('\n'.join(lines), json.loads(result))
+
+    def supports(self, module: str) -> bool:
+        if module not in self.modules:
+            self.modules[module] = self.call('supports', module)[1] == 1
+
+        return self.modules[module]
+
+    @staticmethod
+    def verify(digest: str, output: str) -> str:
+        if digest == output.strip():
             return 'OK'
-        
-        return f'{v} != {output}'
 
-    def get(self, filename: str) -> Tuple[bytes, bool]:
+        return f'{digest[:8]} != {output.strip()[:8] or "?"}'
+
+    def checksum(self, source: str, data: Union[bytes, str, BinaryIO]) -> str:
+        _, output = self.call('digest', source)
+
+        if isinstance(data, str):
+            data = data.encode('utf-8')
+
+        if isinstance(data, bytes):
+            data = io.BytesIO(data)
+
+        digest = hashlib.sha256()
+
+        for chunk in iter(lambda: data.read(BUFFER_SIZE), b''):
+            digest.update(chunk)
+
+        return self.verify(digest.hexdigest(), output)
+
+    def stream(self, filename: str, fh: BinaryIO) -> str:
         if not filename.startswith('/'):
             filename = '/' + filename
 
-        output = self.terminal(f"""
-            import sys
-            import ubinascii
-            with open('{filename}', 'rb') as infile:
-                while True:
-                    result = infile.read({BUFFER_SIZE})
-                    if result == b'':
-                        break
-                    sys.stdout.write(ubinascii.hexlify(result))
-        """)
-        output = binascii.unhexlify(output)
+        start = time.monotonic()
+        position = fh.tell()
+        checksum = self.receive(filename, fh)
+        size = fh.tell() - position
+        self.telemetry.record(filename, size, size, time.monotonic() - start, checksum)
 
-        if filename.endswith('.mpy'):
-            return (output, '???')
+        return checksum
 
-        return (output, self.checksum(filename, output))
+    def receive(self, filename: str, fh: BinaryIO) -> str:
+        digest = hashlib.sha256()
 
-    def download(self, source: str, destination: str) -> str:
-        output, checksum = self.get(source)
+        if isinstance(self.pyboard.serial, WebREPL):
+            def write(chunk: bytes):
+                fh.write(chunk)
+                digest.update(chunk)
+                self.pyboard.bytes_in += len(chunk)
+
+            # WebREPL has its own binary file transfer, the raw REPL is then only needed for the SHA-256.
+            self.pyboard.track()
+            self.pyboard.serial.get(filename, write, self.pyboard.transfer_status)
+            self.pyboard.tracking = None
+
+            return self.verify(digest.hexdigest(), self.call('digest', filename)[1])
+
+        # The board hashes what it reads and returns the SHA-256 once the last frame is sent.
+        _, output = self.call('send', filename, transfer=lambda: self.frames(fh, digest))
+
+        return self.verify(digest.hexdigest(), output)
+
+    def frames(self, fh: BinaryIO, digest: Any) -> bool:
+        self.pyboard.track()
+
+        # Each frame is \x01 followed by its length, an empty frame ends the file, a \x04 means the board stopped early.
+        while self.pyboard.read_exactly(1) == b'\x01':
+            n = struct.unpack('<H', self.pyboard.read_exactly(2))[0]
+
+            if n == 0:
+                return True
+
+            chunk = self.pyboard.read_exactly(n)
+            fh.write(chunk)
+            digest.update(chunk)
+            self.pyboard.transfer_status()
+
+        return False
+
+    def get(self, filename: str) -> Tuple[bytes, str]:
+        output = io.BytesIO()
+        checksum = self.stream(filename, output)
 
+        return (output.getvalue(), checksum)
+
+    def download(self, source: str, destination: str) -> str:
         with open(destination, 'wb') as fh:
-            fh.write(output)
-            
-        return checksum
+            return self.stream(source, fh)
+
+    def sender(self, data: bytes) -> Callable[[], bool]:
+        def transfer() -> bool:
+            # The board asks with \x01 for the size first, then for each chunk once the previous one is written. Nothing
+            # is sent before that first \x01: the board disables Ctrl-C ahead of it, so a 0x03 in the size can't interrupt it.
+            if self.pyboard.read_exactly(1) != b'\x01':
+                return False
+
+            self.pyboard.track(len(data))
+
+            self.pyboard.write(struct.pack('<I', len(data)))
+
+            for i in range(0, len(data), BUFFER_SIZE):
+                if self.pyboard.read_exactly(1) != b'\x01':
+                    return False
+
+                self.pyboard.write(data[i: i + BUFFER_SIZE])
+                self.pyboard.transfer_status()
+
+            return True
+
+        return transfer
+
+    @staticmethod
+    def compress(data: bytes) -> bytes:
+        # Each frame is deflated on its own (length-prefixed) so the board never inflates more than one frame at a time.
+        payload = []
+
+        for i in range(0, len(data), COMPRESS_FRAME_SIZE):
+            z = zlib.compressobj(9, zlib.DEFLATED, -COMPRESS_WBITS)
+            frame = z.compress(data[i: i + COMPRESS_FRAME_SIZE]) + z.flush()
+            payload.extend([struct.pack('<H', len(frame)), frame])
 
-    def put(self, filename: str, data: bytes) -> Tuple[str, bool]:
+        return b''.join(payload)
+
+    def compressible(self) -> bool:
+        return self.compression and self.supports('deflate')
+
+    @classmethod
+    def prepare(cls, filename: str, data: bytes, compress: bool = False) -> Tuple[str, bytes, bytes, bool, str]:
+        # Host side only (no board access) so it can run ahead of the transfers on other threads.
         if not filename.startswith('/'):
             filename = '/' + filename
 
         if not isinstance(data, bytes):
             data = bytes(data, encoding='utf8')
 
+        payload = data
+        compressed = False
+
+        # Small files and files that barely shrink (images, archives, .mpy...) are sent as they are.
+        if compress and len(data) >= COMPRESS_THRESHOLD:
+            if len(frames := cls.compress(data)) < len(data) * 0.9:
+                payload = frames
+                compressed = True
+
+        return (filename, data, payload, compressed, hashlib.sha256(data).hexdigest())
+
+    def put(self, filename: str, data: bytes) -> Tuple[str, str, int]:
+        return self.transmit(self.prepare(filename, data, self.compressible()))
+
+    def transmit(self, prepared: Tuple[str, bytes, bytes, bool, str]) -> Tuple[str, str, int]:
+        filename, data, payload, compressed, digest = prepared
+
         try:
-            if os.path.dirname(filename):
-                self.mkdir(os.path.dirname(filename))
+            self.mkdirs([os.path.dirname(filename)])
 
-            with self.pyboard as terminal:
-                size = len(data)
-                terminal(f"""fh = open('{filename}', 'wb')""")
+            if not compressed and isinstance(self.pyboard.serial, WebREPL):
+                self.pyboard.track(len(data))
+                self.pyboard.serial.put(filename, data, self.pyboard.transfer_status)
+                self.pyboard.tracking = None
+                self.pyboard.bytes_out += len(data)
 
-                for i in range(0, size, BUFFER_SIZE):
-                    chunk_size = min(BUFFER_SIZE, size - i)
-                    chunk = repr(data[i : i + chunk_size])
-                    terminal(f"""fh.write({chunk})""")
+                return (filename, self.verify(digest, self.call('digest', filename)[1]), len(data))
 
-                terminal("""fh.close()""")
+            # The board hashes what it writes to flash and returns the SHA-256 in the same session.
+            _, output = self.call('receive', filename, compressed, transfer=self.sender(payload))
         except Exception as e:
             raise e
 
-        if filename.endswith('.mpy'):
-            return (filename, '???')
+        return (filename, self.verify(digest, output), len(payload))
+
+    def blocks(self, filename: str) -> Tuple[int, List[str], List[List[int]]]:
+        if not filename.startswith('/'):
+            filename = '/' + filename
+
+        _, (size, blocks, sums) = self.call('blocks', filename, DELTA_BLOCK_SIZE)
+
+        return (size, blocks, sums)
+
+    @staticmethod
+    def delta(data: bytes, size: int, blocks: List[str], sums: List[List[int]]) -> Tuple[bytes, int]:
+        # Rsync-like matching: the board sends the byte sums of each block's quarters along with its hash. Those sums
+        # are rolled over every offset here through prefix sums, the hash is only computed where they all match,
+        # so unchanged blocks are found again even after an insertion shifted them.
+        recipe = []
+        literal = 0
+        view = memoryview(data)
+        indexes = {}
+        n = DELTA_BLOCK_SIZE
+        q = n >> 2
+        tail_size = size - (len(blocks) - 1) * n
+
+        for index, digest in enumerate(blocks[:-1] if tail_size < n else blocks):
+            indexes.setdefault(tuple(sums[index]), {}).setdefault(digest, index)
+
+        prefix = array.array('q', itertools.accumulate(data, initial=0))
+        totals = {sum(key) for key in indexes}
+        candidates = [i for i, total in enumerate(map(operator.sub, prefix[n:], prefix)) if total in totals]
+
+        def block(i: int, j: int) -> str:
+            return hashlib.sha256(view[i: j]).digest()[:8].hex()
+
+        def add_literal(i: int, j: int):
+            nonlocal literal
+
+            if j > i:
+                recipe.extend([struct.pack('<BI', ord('L'), j - i), view[i: j]])
+                literal += j - i
+
+        start = 0
+
+        for i in candidates:
+            if i < start:
+                continue
+
+            key = (prefix[i + q] - prefix[i], prefix[i + 2 * q] - prefix[i + q], prefix[i + 3 * q] - prefix[i + 2 * q], prefix[i + n] - prefix[i + 3 * q])
+
+            if (digests := indexes.get(key)) and (index := digests.get(block(i, i + n))) is not None:
+                add_literal(start, i)
+                recipe.append(struct.pack('<BI', ord('C'), index))
+                start = i + n
+
+        if blocks and 0 < tail_size < n and len(data) - start >= tail_size and block(len(data) - tail_size, len(data)) == blocks[-1]:
+            add_literal(start, len(data) - tail_size)
+            recipe.append(struct.pack('<BI', ord('C'), len(blocks) - 1))
+        else:
+            add_literal(start, len(data))
+
+        return (b''.join(recipe), literal)
+
+    def patch(self, filename: str, data: bytes) -> Optional[Tuple[str, str, int]]:
+        if not filename.startswith('/'):
+            filename = '/' + filename
+
+        size, blocks, sums = self.blocks(filename)
+
+        if size < 0 or not blocks:
+            return None
+
+        recipe, literal = self.delta(data, size, blocks, sums)
 
-        return (filename, self.checksum(filename, data))
+        # Not worth it when most of the file changed, a plain put is simpler.
+        if literal > len(data) // 2:
+            return None
 
-    def upload(self, source: str, destination: str) -> str:
+        # The board rebuilds the file from its own blocks (C) and the literal bytes we send (L) into a temp file, then renames it.
+        _, output = self.call('patch', filename, DELTA_BLOCK_SIZE, transfer=self.sender(recipe))
+
+        return (filename, self.verify(hashlib.sha256(data).hexdigest(), output), len(recipe))
+
+    def upload(self, source: str, destination: str) -> Tuple[str, int]:
         with open(source, 'rb') as fh:
-            _, checksum = self.put(destination, fh.read())
+            return self.deliver(self.prepare(destination, fh.read(), self.compressible()))
 
-        return checksum
+    def deliver(self, prepared: Tuple[str, bytes, bytes, bool, str]) -> Tuple[str, int]:
+        filename, data = prepared[:2]
+        start = time.monotonic()
+
+        # Large files already on the board only get their changed blocks.
+        if len(data) >= DELTA_THRESHOLD and (patched := self.patch(filename, data)):
+            _, checksum, wire = patched
+        else:
+            _, checksum, wire = self.transmit(prepared)
+
+        self.telemetry.record(filename, len(data), wire, time.monotonic() - start, checksum)
+
+        return (checksum, wire)
+
+    def push(self, files: List[Tuple[str, str]]) -> Tuple[List[Tuple[str, str, str]], int]:
+        # The whole batch goes as one archive: a header (path length, mode, size) and the path per entry, directories
+        # first (shallowest first) then each file followed by its contents. The SHA-256 are checked here on return.
+        archive = []
+        digests = {}
+        dirnames = self.plan([os.path.dirname(destination) for _, destination in files])
+
+        for dirname in dirnames:
+            archive.append(struct.pack('<HHI', len(dirname.encode()), 0x4000, 0) + dirname.encode())
+
+        for source, destination in files:
+            if not destination.startswith('/'):
+                destination = '/' + destination
+
+            with open(source, 'rb') as fh:
+                data = fh.read()
+
+            digests[destination] = hashlib.sha256(data).hexdigest()
+            archive.append(struct.pack('<HHI', len(destination.encode()), 0x8000, len(data)) + destination.encode() + data)
+
+        archive = b''.join(archive)
+        _, output = self.call('unpack', transfer=self.sender(archive))
+        results = []
+
+        # Every entry comes back with a status: files with the SHA-256 of what was written when set, the exception otherwise.
+        for filename, status, result in output:
+            if filename not in digests:
+                if status:
+                    self.directories.add(filename)
+            elif status:
+                results.append((filename, self.verify(digests[filename], result), ''))
+            else:
+                results.append((filename, '', result))
+
+        return (results, len(archive))
+
+    def pull(self, dirname: str, destination: str) -> List[Tuple[str, int, str]]:
+        results = []
+
+        def transfer() -> bool:
+            # Each entry starts with \x01 and its header, an empty path ends the archive, a \x04 means the board stopped early.
+            while self.pyboard.read_exactly(1) == b'\x01':
+                k, mode, size = struct.unpack('<HHI', self.pyboard.read_exactly(8))
+
+                if k == 0:
+                    return True
+
+                filename = self.pyboard.read_exactly(k).decode('utf-8')
+                target = os.path.join(destination, filename.strip('/')).replace(os.sep, '/')
+
+                if mode == 0x4000:
+                    os.makedirs(target, exist_ok=True)
+                    results.append((filename, -1, ''))
+                    continue
+
+                digest = hashlib.sha256()
+
+                with open(target, 'wb') as fh:
+                    if not self.frames(fh, digest):
+                        return False
+
+                results.append((filename, size, self.verify(digest.hexdigest(), self.pyboard.read_exactly(32).hex())))
+
+            return False
+
+        self.call('pack', dirname.strip('./').strip('/'), transfer=transfer)
+
+        return results
 
     def ls(self, dirname: str = '/') -> Tuple[int, List, str]:
-        dirname = dirname.strip('./').strip('/')
+        return self.call('ls', dirname.strip('./').strip('/'))[1]
 
-        output = self.terminal(f"""
-            try:        
-                import os
-                import json
-            except ImportError:
-                import uos as os
-                import ujson as json
+    def rm(self, filename: str) -> Tuple[int, List, str]:
+        if not filename.startswith('/'):
+            filename = '/' + filename
 
-            def ls(dirname):
-                e = []
-                s = os.stat(dirname)
-                if s[0] == 0x4000:
-                    if not dirname.endswith('/'):
-                        dirname += '/'
-                    e.append((dirname, -1))
-                    for t in os.ilistdir(dirname):
-                        if dirname.startswith('/'):
-                            dirname = dirname[1:]
-                        if t[1] == 0x4000:
-                            e.extend(ls(dirname + t[0] + '/'))
-                        else:
-                            e.append((dirname + t[0], os.stat(dirname + t[0])[6]))
-                else:
-                    e.append((dirname, s[6]))
-                return sorted(e)
-            
+        # Whatever was below the removed path can no longer be assumed to exist.
+        self.directories = {d for d in self.directories if d != filename.rstrip('/') and not d.startswith(filename.rstrip('/') + '/')}
+
+        return self.call('rm', filename)[1]
+
+    def unlink(self, filenames: List[str]) -> List[str]:
+        # Quietly removes the files that exist, in one call, and returns those that did.
+        return self.call('unlink', ['/' + filename.strip('/') for filename in filenames])[1]
+
+    def manifest(self, dirname: str = '/') -> List:
+        # One line per file (path, size and SHA-256 separated by tabs) so the board never holds the whole listing.
+        output, _ = self.call('manifest', dirname.strip('./').strip('/'))
+        files = []
+
+        for line in output.splitlines():
+            if len(columns := line.strip().split('\t')) == 3:
+                files.append((columns[0], int(columns[1]), columns[2]))
+
+        return files
+
+    def mkdir(self, dirname: str) -> List:
+        return self.mkdirs([dirname])
+
+    def plan(self, dirnames: List[str]) -> List[str]:
+        # Every parent not yet known to exist, shallowest first.
+        planned = set()
+
+        for dirname in dirnames:
+            parts = [d for d in dirname.split('/') if d]
+
+            for i in range(1, len(parts) + 1):
+                planned.add('/' + '/'.join(parts[:i]))
+
+        return sorted(planned - self.directories, key=lambda d: (d.count('/'), d))
+
+    def mkdirs(self, dirnames: List[str]) -> List:
+        # Every missing parent is created in one call and remembered for the rest of the session.
+        planned = self.plan(dirnames)
+
+        if not planned:
+            return []
+
+        output = self.call('mkdirs', planned)[1]
+        self.directories.update([d for d, checked, *_ in output if checked])
+
+        return output
+
+    def launch(self, filename: str):
+        self.directories = set()
+
+        try:
+            self.terminal(f"""
+                with open('{filename}', 'r') as fh:
+                    exec(fh.read())
+            """, stream_output=True)
+        except Exception as e:
+            print(str(e))
+
+    def terminal(self, command: str, stream_output: bool = False, transfer: Optional[Callable[[], bool]] = None) -> str:
+        with self.pyboard as terminal:
             try:
-                s = 1
-                r = ls('{dirname}')
-                x = ''
+                return terminal(command, stream_output=stream_output, transfer=transfer)
             except Exception as e:
-                s = 0
-                r = [('{dirname}', -2)]
-                x = str(e)
+                raise e
 
-            print(json.dumps([s, r, x]))
-        """)
-        
-        return json.loads(output)
 
-    def rm(self, filename: str) -> Tuple[int, List, str]:
-        if not filename.startswith('/'):
-            filename = '/' + filename
+class Pipeline(object):
+    filesystem: FileSystem
+    workers: int
+    depth: int
+    timings: dict
+
+    def __init__(self, filesystem: FileSystem, workers: int = 4, depth: int = 8):
+        self.filesystem = filesystem
+        self.workers = workers
+        self.depth = depth
+        self.timings = {}
+
+    def run(self, plan: List[Tuple[str, str, int]]):
+        # Worker threads read, hash and compress ahead into a bounded queue (in the order of the plan),
+        # while this thread alone talks to the board and keeps the link busy.
+        compress = self.filesystem.compressible() if plan else False
+        self.timings = {'read': 0.0, 'prepare': 0.0, 'wait': 0.0, 'transfer': 0.0, 'total': 0.0}
+        queue = Queue(maxsize=self.depth)
+        lock = threading.Lock()
+        start = time.monotonic()
+
+        def produce(source: str, destination: str) -> Tuple[str, bytes, bytes, bool, str]:
+            t0 = time.monotonic()
+
+            with open(source, 'rb') as fh:
+                data = fh.read()
+
+            t1 = time.monotonic()
+            prepared = FileSystem.prepare(destination, data, compress)
+
+            with lock:
+                self.timings['read'] += t1 - t0
+                self.timings['prepare'] += time.monotonic() - t1
+
+            return prepared
+
+        cancelled = threading.Event()
+
+        def feed():
+            with ThreadPoolExecutor(max_workers=self.workers) as pool:
+                for source, destination, size in plan:
+                    if cancelled.is_set():
+                        break
+
+                    queue.put((destination, size, pool.submit(produce, source, destination)))
+
+            queue.put(None)
+
+        threading.Thread(target=feed, daemon=True).start()
+        item = ()
+
+        try:
+            while (item := queue.get()) is not None:
+                destination, size, future = item
+                t0 = time.monotonic()
+
+                try:
+                    prepared = future.result()
+                    t1 = time.monotonic()
+                    self.timings['wait'] += t1 - t0
+
+                    try:
+                        checksum, wire = self.filesystem.deliver(prepared)
+                    finally:
+                        self.timings['transfer'] += time.monotonic() - t1
+
+                    result = (destination, size, checksum, wire, '')
+                except Exception as e:
+                    result = (destination, size, '', 0, str(e))
+
+                self.timings['total'] = time.monotonic() - start
+
+                yield result
+        finally:
+            # Left early (an interrupt, a consumer that stops iterating): the feeder is unblocked and told to stop, and
+            # the queue is drained up to its last item so that no thread or pool outlives the sync.
+            cancelled.set()
+
+            while item is not None:
+                if (item := queue.get()) is not None:
+                    item[2].cancel()
+
+
+class Compiler(object):
+    flags: List[str]
+    version: str = ''
+
+    def __init__(self, flags: Optional[List[str]] = None):
+        self.flags = list(flags or [])
+
+    def mpy_version(self) -> str:
+        if not self.version:
+            output, _ = mpy_cross.run('--version', stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()
+            self.version = output.decode('utf-8').strip()
+
+        return self.version
+
+    def key(self, source: bytes, name: str) -> str:
+        # The bytecode only depends on the source, its name on the board, mpy-cross itself and the architecture flags.
+        digest = hashlib.sha256(source)
+
+        for value in [name, self.mpy_version()] + self.flags:
+            digest.update(b'\x00' + value.encode('utf-8'))
+
+        return digest.hexdigest()
+
+    def compile(self, filename: str, name: str) -> Tuple[str, bool]:
+        with open(filename, 'rb') as fh:
+            target = os.path.join(MPY_CACHE_DIR, self.key(fh.read(), name) + '.mpy')
+
+        if os.path.isfile(target):
+            return (target, True)
+
+        os.makedirs(MPY_CACHE_DIR, exist_ok=True)
+        temp = f'{target}.{os.getpid()}.{threading.get_ident()}'
+        _, error = mpy_cross.run('-o', temp, '-s', name, *self.flags, filename, stdout=subprocess.PIPE, stderr=subprocess.PIPE).communicate()
+
+        if not os.path.isfile(temp):
+            raise Exception(error.decode('utf-8').strip() or f'mpy-cross failed to compile: {name}')
+
+        os.replace(temp, target)
+
+        return (target, False)
+
+    def build(self, files: List[Tuple[str, str]]) -> List[Tuple[str, str, bool, str]]:
+        # Each compile is an mpy-cross process of its own, the threads only wait on them.
+        def job(file: Tuple[str, str]) -> Tuple[str, str, bool, str]:
+            try:
+                return (file[1], *self.compile(*file), '')
+            except Exception as e:
+                return (file[1], '', False, str(e))
+
+        with ThreadPoolExecutor(max_workers=os.cpu_count() or 4) as pool:
+            return list(pool.map(job, files))
+
+
+class Watcher(object):
+    # Paths changed under a directory, relative to it: inotify when the libc has it, otherwise a poll
+    # of the sizes and mtimes with os.scandir. An empty path means the events overflowed, anything may have changed.
+    IN_CLOSE_WRITE: int = 0x008
+    IN_MOVED_FROM: int = 0x040
+    IN_MOVED_TO: int = 0x080
+    IN_CREATE: int = 0x100
+    IN_DELETE: int = 0x200
+    IN_Q_OVERFLOW: int = 0x4000
+    IN_IGNORED: int = 0x8000
+    IN_ISDIR: int = 0x40000000
+    root: str
+    fd: int = -1
+    watches: dict
+    snapshot: dict
+
+    def __init__(self, root: str):
+        self.root = root
+        self.watches = {}
+        self.snapshot = {}
+
+        try:
+            self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+            self.fd = self.libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+        except Exception:
+            self.fd = -1
+
+        if self.fd >= 0:
+            self.watch(root)
+        else:
+            self.snapshot = self.scan()
+
+    @property
+    def backend(self) -> str:
+        return 'inotify' if self.fd >= 0 else 'polling'
+
+    @staticmethod
+    def ignored(name: str) -> bool:
+        # Hidden files (.git, editor swap files) are never uploaded, nor are backups and caches.
+        return name.startswith('.') or name.endswith('~') or name == '__pycache__'
+
+    def relative(self, filename: str) -> str:
+        filename = os.path.relpath(filename, self.root).replace(os.sep, '/')
+
+        return '' if filename == '.' else filename
+
+    def watch(self, dirname: str):
+        mask = self.IN_CLOSE_WRITE | self.IN_MOVED_FROM | self.IN_MOVED_TO | self.IN_CREATE | self.IN_DELETE
+
+        if (wd := self.libc.inotify_add_watch(self.fd, os.fsencode(dirname), mask)) >= 0:
+            self.watches[wd] = dirname
+
+        try:
+            for entry in os.scandir(dirname):
+                if entry.is_dir(follow_symlinks=False) and not self.ignored(entry.name):
+                    self.watch(entry.path)
+        except OSError:
+            pass
+
+    def scan(self) -> dict:
+        snapshot = {}
+
+        def walk(dirname: str):
+            try:
+                for entry in os.scandir(dirname):
+                    if self.ignored(entry.name):
+                        continue
+
+                    if entry.is_dir(follow_symlinks=False):
+                        # Only whether a directory is there matters, its mtime moves with every file inside.
+                        snapshot[entry.path] = (-1, 0)
+                        walk(entry.path)
+                    else:
+                        stat = entry.stat()
+                        snapshot[entry.path] = (stat.st_size, stat.st_mtime_ns)
+            except OSError:
+                pass
+
+        walk(self.root)
+
+        return snapshot
+
+    def poll(self, timeout: float) -> Set[str]:
+        changes = set()
+
+        if self.fd < 0:
+            time.sleep(timeout)
+            snapshot = self.scan()
 
-        output = self.terminal(f"""
-            try:        
-                import os
-                import json
-            except ImportError:
-                import uos as os
-                import ujson as json
+            for filename in snapshot.keys() | self.snapshot.keys():
+                if snapshot.get(filename) != self.snapshot.get(filename):
+                    changes.add(self.relative(filename))
 
-            def ls(dirname):
-                e = []
-                if not dirname.endswith('/'):
-                    dirname += '/'
-                for t in os.ilistdir(dirname):
-                    if dirname.startswith('/'):
-                        dirname = dirname[1:]
-                    if t[1] == 0x4000:
-                        e.append((dirname + t[0] + '/', -1))
-                        e.extend(ls(dirname + t[0] + '/'))
-                    else:
-                        e.append((dirname + t[0], os.stat(dirname + t[0])[6]))
-                return sorted(e, reverse=True)
-
-            def rm(filename):
-                r = []
-                if os.stat(filename)[0] == 0x4000:
-                    e = ls(filename)
-                    if filename != '/':
-                        e.append((filename.strip('/'), -1))
-                    for f, s in e:
-                        if not s == -1:
-                            try:
-                                os.remove(f)
-                                r.append((f, 1, ''))
-                            except Exception as e:
-                                r.append((f, 0, str(e)))
-                    for f, s in e:
-                        if s == -1:
-                            try:
-                                os.rmdir(f)
-                                r.append((f, 1, ''))
-                            except Exception as e:
-                                r.append((f, 0, str(e)))
-                else:
-                    try:
-                        os.remove(filename)
-                        r.append((filename, 1, ''))
-                    except Exception as e:
-                        r.append((filename, 0, str(e)))
-                return r
+            self.snapshot = snapshot
 
-            try:
-                s = 1
-                r = rm('{filename}')
-                x = ''
-            except Exception as e:
-                s = 0
-                r = [('{filename}', 0, str(e))]
-                x = str(e)
+            return changes
 
-            print(json.dumps([s, r, x]))
-        """)
+        if not select.select([self.fd], [], [], timeout)[0]:
+            return changes
 
-        return json.loads(output)
+        data = os.read(self.fd, 64 * 1024)
+        i = 0
 
-    def mkdir(self, dirname: str) -> List:
-        if not dirname.startswith('/'):
-            dirname = '/' + dirname
-        
-        if dirname.endswith('/'):
-            dirname = dirname[:-1]
+        while i + 16 <= len(data):
+            wd, mask, _, size = struct.unpack_from('iIII', data, i)
+            name = os.fsdecode(data[i + 16:i + 16 + size].rstrip(b'\x00'))
+            i += 16 + size
 
-        output = self.terminal(f"""
-            try:        
-                import os
-                import json
-            except ImportError:
-                import uos as os
-                import ujson as json
+            if mask & self.IN_Q_OVERFLOW:
+                changes.add('')
+            elif mask & self.IN_IGNORED:
+                self.watches.pop(wd, None)
+            elif wd in self.watches and name and not self.ignored(name):
+                filename = os.path.join(self.watches[wd], name)
 
-            r = []
-            d = []
-            for zd in str('{dirname}').split('/'):
-                if not zd:
-                    continue
-                d.append(zd)
-                zd = '/'.join(d)
-                try:
-                    os.mkdir(zd)
-                    r.append(('/' + zd, 1))
-                except Exception as e:
-                    if str(e).find('EEXIST'):
-                        r.append(('/' + zd, 1))
-                    else:
-                        r.append(('/' + zd, 0, str(e)))
+                if mask & self.IN_ISDIR and mask & (self.IN_CREATE | self.IN_MOVED_TO):
+                    # Files may land in a new directory before it is watched, the directory stands for them.
+                    self.watch(filename)
 
-            print(json.dumps(r))
-        """)
+                changes.add(self.relative(filename))
 
-        return json.loads(output)
+        return changes
 
-    def launch(self, filename: str):
-        try:
-            self.terminal(f"""
-                with open('{filename}', 'r') as fh:
-                    exec(fh.read())
-            """, stream_output=True)
-        except Exception as e:
-            print(str(e))
+    def close(self):
+        if self.fd >= 0:
+            os.close(self.fd)
+            self.fd = -1
 
-    def terminal(self, command: str, stream_output: bool = False) -> str:
-        with self.pyboard as terminal:
-            try:
-                return terminal(command, stream_output=stream_output)
-            except Exception as e:
-                raise e
-    
 
 class Picowatch(object):
+    deploy_mpy: bool = False
 
-    def __init__(self, pyboard: Pyboard):
+    def __init__(self, pyboard: Pyboard, handle_interrupt: bool = True):
         self.filesystem = FileSystem(pyboard)
-        signal.signal(signal.SIGINT, lambda signum, frame: self.interrupt())
+        self.compiler = Compiler(dotenv_values(os.path.join(LISTENING_TO, '.picowatch')).get('MPY_FLAGS', '').split())
+
+        if handle_interrupt:
+            signal.signal(signal.SIGINT, lambda signum, frame: self.interrupt())
 
     def boot(self):
+        self.filesystem.forget()
         self.filesystem.pyboard.boot()
 
     def system(self):
@@ -618,6 +2015,7 @@ class Picowatch(object):
             import machine
             machine.soft_reset()
         """)
+        self.filesystem.forget()
         self.interrupt()
     
     def flash(self):
@@ -625,12 +2023,16 @@ class Picowatch(object):
             import machine
             machine.bootloader()
         """)
+        self.filesystem.forget()
         self.interrupt()
 
     def interrupt(self):
         self.filesystem.pyboard.send_ctrl_c()
         self.filesystem.pyboard.until_nothing_in_waiting()
 
+    def close(self):
+        self.filesystem.pyboard.close()
+
     def terminal(self, command: str):
         self.filesystem.terminal(command, stream_output=True)
 
@@ -668,6 +2070,102 @@ class Picowatch(object):
 
         return queue
 
+    def internal_plan(self, queue: List[Tuple[str, int]], mkdirs: bool = True) -> List[Tuple[str, str, int]]:
+        # The directories of the whole batch are created up front so each file then costs a single round trip.
+        plan = []
+
+        for source, size in queue:
+            plan.append((source, source.replace(LISTENING_TO.replace(os.sep, '/'), '').strip('/'), size))
+
+        if self.deploy_mpy:
+            plan = self.internal_bytecode(plan)
+
+        if mkdirs:
+            self.filesystem.mkdirs([os.path.dirname(destination) for _, destination, _ in plan])
+
+        return plan
+
+    def internal_sync(self, plan: List[Tuple[str, str, int]], tab: Tab):
+        pipeline = Pipeline(self.filesystem)
+        compiled = {destination for source, destination, _ in plan if source.startswith(MPY_CACHE_DIR)}
+        replaced = []
+
+        for destination, size, checksum, wire, exception in pipeline.run(plan):
+            if exception:
+                tab.line('[?]', destination, '', '', '', exception)
+            else:
+                tab.line('[↑]', destination, f'{round(size / 1024, 2)} kb', f'{round(wire / 1024, 2)} kb', checksum)
+
+                if destination in compiled and checksum == 'OK':
+                    replaced.append(destination[:-4] + '.py')
+
+        # A .py left on the board would be imported instead of its .mpy, it goes once the .mpy is there.
+        for filename in self.filesystem.unlink(replaced) if replaced else []:
+            tab.line('[-]', filename.strip('/'), '', '', 'DELETED')
+
+        if plan:
+            timings = pipeline.timings
+            print(f'[∘] Read: {round(timings["read"], 2)} s, prepare: {round(timings["prepare"], 2)} s, link idle: {round(timings["wait"], 2)} s, transfer: {round(timings["transfer"], 2)} s ({round(100 * timings["transfer"] / max(timings["total"], 1e-6))}% of {round(timings["total"], 2)} s)')
+
+    def internal_compilable(self, destination: str) -> bool:
+        # main.py and boot.py are only run by the board as sources.
+        return destination.endswith('.py') and destination not in ['main.py', 'boot.py']
+
+    def internal_bytecode(self, plan: List[Tuple[str, str, int]]) -> List[Tuple[str, str, int]]:
+        files = [(source, destination) for source, destination, _ in plan if self.internal_compilable(destination)]
+        built = {name: (target, exception) for name, target, _, exception in self.compiler.build(files)}
+        bytecode = []
+
+        for source, destination, size in plan:
+            if destination in built:
+                target, exception = built[destination]
+
+                if exception:
+                    print(f'[?] {destination} is sent as source: {exception.splitlines()[-1]}')
+                else:
+                    bytecode.append((target, destination[:-3] + '.mpy', os.stat(target).st_size))
+                    continue
+
+            bytecode.append((source, destination, size))
+
+        return bytecode
+
+    def internal_index(self, plan: List[Tuple[str, str, int]]) -> dict:
+        # Hashes are cached per project and only recomputed for files whose size or mtime changed.
+        cachename = os.path.join(CACHE_DIR, hashlib.sha256(LISTENING_TO.encode('utf-8')).hexdigest()[:16] + '.json')
+        index = {}
+
+        try:
+            with open(cachename, 'r') as fh:
+                cache = json.load(fh)
+        except:
+            cache = {}
+
+        for source, destination, size in plan:
+            mtime = os.stat(source).st_mtime_ns
+
+            if (entry := cache.get(destination)) and entry[0] == size and entry[1] == mtime:
+                index[destination] = entry
+                continue
+
+            digest = hashlib.sha256()
+
+            with open(source, 'rb') as fh:
+                for chunk in iter(lambda: fh.read(65536), b''):
+                    digest.update(chunk)
+
+            index[destination] = cache[destination] = [size, mtime, digest.hexdigest()]
+
+        try:
+            os.makedirs(CACHE_DIR, exist_ok=True)
+
+            with open(cachename, 'w') as fh:
+                json.dump(cache, fh)
+        except:
+            pass
+
+        return index
+
     def listing(self, filepath: str = '/'):
         filepath = filepath.strip('./')
         tab = Tab(4, 50, 15, nb_columns=4)
@@ -692,17 +2190,15 @@ class Picowatch(object):
             print(ln)
 
     def upload(self, filepath: Union[List, str]):
-        tab = Tab(4, 50, 15, 15, nb_columns=5)
-        tab.head('[ ]', 'Filename', 'Size (kb)', 'Checksum', 'Exception')
+        tab = Tab(4, 50, 15, 15, 15, nb_columns=6)
+        tab.head('[ ]', 'Filename', 'Size (kb)', 'Wire (kb)', 'Checksum', 'Exception')
+
+        queue = []
 
         for f in list(filepath):
-            for source, size in self.internal_ls(f):
-                destination = source.replace(LISTENING_TO.replace(os.sep, '/'), '').strip('/')
+            queue.extend(self.internal_ls(f))
 
-                try:
-                    tab.line('[↑]', destination, f'{round(size / 1024, 2)} kb', self.filesystem.upload(source, destination))
-                except Exception as e:
-                    tab.line('[?]', destination, '', '', str(e))
+        self.internal_sync(self.internal_plan(queue), tab)
 
     def download(self, filepath: Union[List, str]):
         tab = Tab(4, 50, 15, nb_columns=4)
@@ -727,6 +2223,39 @@ class Picowatch(object):
             else:
                 tab.line('[?]', filepath, '', exception)
 
+    def push(self, filepath: Union[List, str]):
+        queue = []
+
+        for f in list(filepath):
+            queue.extend(self.internal_ls(f))
+
+        if not queue:
+            print('Nothing to upload')
+            return
+
+        tab = Tab(4, 50, 15, nb_columns=4)
+        tab.head('[ ]', 'Filename', 'Checksum', 'Exception')
+        files = [(source, source.replace(LISTENING_TO.replace(os.sep, '/'), '').strip('/')) for source, _ in queue]
+        results, wire = self.filesystem.push(files)
+
+        for filename, checksum, exception in results:
+            tab.line('[↑]' if checksum else '[?]', filename.strip('/'), checksum, exception)
+
+        print('-' * 50)
+        print(f'{len(results)} file(s) in a single archive of {round(wire / 1024, 2)} kb')
+
+    def pull(self, filepath: Union[List, str]):
+        tab = Tab(4, 50, 15, nb_columns=4)
+        tab.head('[ ]', 'Filename', 'Checksum', 'Exception')
+
+        for f in list(filepath) or ['/']:
+            try:
+                for filename, size, checksum in self.filesystem.pull(f, LISTENING_TO):
+                    if not size == -1:
+                        tab.line('[↓]', filename, checksum)
+            except Exception as e:
+                tab.line('[?]', f, '', str(e))
+
     def delete(self, filepath: Union[List, str]):
         tab = Tab(4, 50, nb_columns=3)
         tab.head('[ ]', 'Filename', 'Exception')
@@ -816,62 +2345,131 @@ class Picowatch(object):
         changes = self.status(return_output=True)
 
         if changes:
-            tab = Tab(4, 30, 15, 15, nb_columns=5)
-            tab.head('[ ]', 'Filename', 'Size (kb)', 'Checksum', 'Exception')
+            self.deploy(changes)
+            print('-' * 50)
+            self.internal_commit(message)
+        else:
+            print('Pyboard is up to date')
 
-            for filepath in [filename for status, filename in changes if status == -1]:
-                filepath = filepath.strip('/')
-                status, output, exception = self.filesystem.rm(filepath)
+    def deploy(self, changes: List[Tuple[int, str]]):
+        tab = Tab(4, 30, 15, 15, 15, nb_columns=6)
+        tab.head('[ ]', 'Filename', 'Size (kb)', 'Wire (kb)', 'Checksum', 'Exception')
 
-                if status:
-                    for filename, checked, exception in output:
-                        if checked:
-                            tab.line('[-]', filename, '', 'DELETED')
-                        else:
-                            tab.line('[?]', filename, '', '', exception)
-                else:
-                    tab.line('[?]', filepath, '', '', exception)
+        for filepath in [filename for status, filename in changes if status == -1]:
+            filepath = filepath.strip('/')
 
-            queue = []
+            if self.deploy_mpy and self.internal_compilable(filepath):
+                for filename in self.filesystem.unlink([filepath, filepath[:-3] + '.mpy']):
+                    tab.line('[-]', filename.strip('/'), '', '', 'DELETED')
 
-            for filepath in [filename for status, filename in changes if status == 1]:
-                queue.extend(self.internal_ls(filepath))
+                continue
 
-            for source, size in queue:
-                destination = source.replace(LISTENING_TO.replace(os.sep, '/'), '').strip('/')
+            status, output, exception = self.filesystem.rm(filepath)
 
-                try:
-                    tab.line('[↑]', destination, f'{round(size / 1024, 2)} kb', self.filesystem.upload(source, destination))
-                except Exception as e:
-                    tab.line('[?]', destination, '', '', str(e))
+            if status:
+                for filename, checked, exception in output:
+                    if checked:
+                        tab.line('[-]', filename, '', '', 'DELETED')
+                    else:
+                        tab.line('[?]', filename, '', '', '', exception)
+            else:
+                tab.line('[?]', filepath, '', '', '', exception)
 
-            print('-' * 50)
+        queue = []
 
-            if not message:
-                message = 'Synchronize Pyboard along with associated commit(s)'
-            else:
-                message = message.strip('"').strip("'")
+        for filepath in [filename for status, filename in changes if status == 1]:
+            queue.extend(self.internal_ls(filepath))
 
-            try:
-                output = subprocess.check_output(['git', 'commit', '-am', message], stderr=subprocess.STDOUT)
+        self.internal_sync(self.internal_plan(queue), tab)
 
-                for line in output.decode('utf-8').split('\n'):
-                    print(line)
-            except Exception as e:
-                try:
-                    message = e.output.decode('utf-8').strip()
-                except:
-                    message = str(e).strip()
+    def internal_commit(self, message: str = ''):
+        if not message:
+            message = 'Synchronize Pyboard along with associated commit(s)'
         else:
-            print('Pyboard is up to date')
+            message = message.strip('"').strip("'")
+
+        try:
+            output = subprocess.check_output(['git', 'commit', '-am', message], stderr=subprocess.STDOUT)
+
+            for line in output.decode('utf-8').split('\n'):
+                print(line)
+        except Exception as e:
+            try:
+                message = e.output.decode('utf-8').strip()
+            except:
+                message = str(e).strip()
         
-    def compile(self, filename: str):
-        _, error = mpy_cross.run(filename, stderr=subprocess.PIPE, stdout=subprocess.PIPE, shell=True).communicate()
+    def mirror(self, filepath: str = '/'):
+        filepath = filepath.strip('./').strip('/')
+        # The index covers what would be deployed, the compiled .mpy in place of the .py with bytecode on.
+        plan = {destination: source for source, destination, _ in self.internal_plan(self.internal_ls(filepath or '/'), mkdirs=False)}
+        local = self.internal_index([(source, destination, os.stat(source).st_size) for destination, source in plan.items()])
+        remote = {filename: (size, digest) for filename, size, digest in self.filesystem.manifest(filepath)}
+        uploads = sorted([filename for filename, (size, _, digest) in local.items() if remote.get(filename) != (size, digest)])
+        # A .py replaced by an uploaded .mpy is only removed by internal_sync() once the .mpy is delivered.
+        deletions = sorted([filename for filename in remote if filename not in local and filename[:-3] + '.mpy' not in uploads])
+
+        if not deletions and not uploads:
+            print('Pyboard is up to date')
+            return
 
-        if error:
-            print(error.decode('utf-8'))
-        else:
+        tab = Tab(4, 50, 15, 15, 15, nb_columns=6)
+        tab.head('[ ]', 'Filename', 'Size (kb)', 'Wire (kb)', 'Checksum', 'Exception')
+
+        for filename in deletions:
+            status, output, exception = self.filesystem.rm(filename)
+
+            if status:
+                for filename, checked, exception in output:
+                    if checked:
+                        tab.line('[-]', filename, '', '', 'DELETED')
+                    else:
+                        tab.line('[?]', filename, '', '', '', exception)
+            else:
+                tab.line('[?]', filename, '', '', '', exception)
+
+        self.filesystem.mkdirs([os.path.dirname(destination) for destination in uploads])
+        self.internal_sync([(plan[destination], destination, local[destination][0]) for destination in uploads], tab)
+
+        print('-' * 50)
+        print(f'{len(uploads)} uploaded, {len(deletions)} deleted, {len(local) - len(uploads)} unchanged')
+
+    def compression(self):
+        self.filesystem.compression = not self.filesystem.compression
+        print(f'Compressed uploads: {"enabled" if self.filesystem.compression else "disabled"}')
+
+    def report(self, format: str = 'ndjson', path: str = ''):
+        if format not in ['json', 'ndjson', 'off']:
+            raise Exception(f'Report: unknown format "{format}", use json, ndjson or off.')
+
+        Telemetry.format = '' if format == 'off' else format
+        # Kept out of the project by default: it would be uploaded to the board and committed along with it.
+        Telemetry.path = path or os.path.join(CACHE_DIR, 'reports', hashlib.sha256(LISTENING_TO.encode('utf-8')).hexdigest()[:16] + f'.{format}')
+        os.makedirs(os.path.dirname(os.path.abspath(Telemetry.path)), exist_ok=True)
+        print(f'Reports: {"disabled" if format == "off" else Telemetry.path.replace(os.sep, "/")}')
+
+    def bytecode(self):
+        self.deploy_mpy = not self.deploy_mpy
+        print(f'Deploy .mpy in place of .py: {"enabled" if self.deploy_mpy else "disabled"}')
+
+    def compile(self, filename: str):
+        try:
+            target, _ = self.compiler.compile(filename, os.path.basename(filename))
+            shutil.copyfile(target, os.path.splitext(filename)[0] + '.mpy')
             print(f'Python file "{filename}" compile to .mpy')
+        except Exception as e:
+            print(str(e))
+
+    def build(self):
+        queue = [(source, source.replace(LISTENING_TO.replace(os.sep, '/'), '').strip('/')) for source, _ in self.internal_ls('/')]
+        tab = Tab(4, 50, 15, nb_columns=4)
+        tab.head('[ ]', 'Filename', 'Cache', 'Exception')
+
+        for name, target, cached, exception in self.compiler.build([(source, name) for source, name in queue if self.internal_compilable(name)]):
+            if exception:
+                tab.line('[?]', name, '', exception)
+            else:
+                tab.line('[*]', name, 'HIT' if cached else 'MISS')
 
     def install(self, package_name: str):
         self.terminal(f"""
@@ -886,148 +2484,508 @@ class Picowatch(object):
     def launch(self, filename: str):
         self.filesystem.launch(filename)
 
+    def tail(self, filename: str):
+        pyboard = self.filesystem.pyboard
+        transport = Transport(pyboard)
+        transport.subscribe(lambda data: (sys.stdout.buffer.write(data), sys.stdout.buffer.flush()))
 
-print('Welcome to Picowatch Terminal')
-print(f'Listening to project: {LISTENING_TO.replace(os.sep, "/")}/')
-picowatch = False
+        def interrupt(signum, frame):
+            pyboard.send_ctrl_c()
+            print('\r\n<<< Program interrupted, press Enter to leave')
 
-try:
-    env = dotenv_values('.picowatch')
-    picowatch = Picowatch(Pyboard(env["DEVICE"], env["BAUDRATE"]))
-    print(f'Connected automatically to device: {env["DEVICE"]} at a baudrate of: {env["BAUDRATE"]}')
-except:
-    while not picowatch:
-        print('-' * 50)
-        device = input('Port: ').strip()
-        baudrate = input('Baudrate (115200): ').strip() or 115200
+        def transfer() -> bool:
+            transport.start()
+            print(f'<<< Tailing "{filename}", queries: ls [<path>], mem or exit')
 
-        try:
-            picowatch = Picowatch(Pyboard(device, baudrate))
-            print('-' * 50)
-            print(f'Connected to device: {device} and baudrate: {baudrate}')
+            while transport.alive():
+                try:
+                    line = input().strip()
+                except EOFError:
+                    line = 'exit'
+
+                if not transport.alive():
+                    break
+
+                try:
+                    match line.split(' '):
+                        case ['exit']:
+                            pyboard.send_ctrl_c()
+                            break
+                        case ['ls', *path]:
+                            status, output, exception = transport.request('ls', (path[0] if path else '/').strip('./').strip('/'))
+
+                            if not status:
+                                print(f'>>> {exception}')
+
+                            for remote, size in output if status else []:
+                                print(f'>>> {remote} {"-" if size == -1 else str(round(size / 1024, 2)) + " kb"}')
+                        case ['mem']:
+                            free, alloc = transport.request('mem')
+                            print(f'>>> Free memory: {round(free / 1024, 2)} kb, allocated: {round(alloc / 1024, 2)} kb')
+                        case _:
+                            if line:
+                                print(f'>>> "{line}" does not matched any query (ls, mem or exit)')
+                except Exception as e:
+                    print(f'>>> {str(e) or type(e).__name__}')
+
+            transport.stop()
+
+            return True
 
-            with open(os.path.join(LISTENING_TO, '.picowatch'), 'w+') as fh:
-                fh.write(f'DEVICE = "{device}"\n')
-                fh.write(f'BAUDRATE = {baudrate}\n')
+        handler = signal.signal(signal.SIGINT, interrupt)
+        # The program may create or remove directories while it runs.
+        self.filesystem.directories = set()
+
+        try:
+            self.filesystem.call('serve', filename, transfer=transfer)
         except Exception as e:
-            print(str(e))
+            if 'KeyboardInterrupt' not in str(e):
+                print(str(e))
+        finally:
+            signal.signal(signal.SIGINT, handler)
+
+        # The program keeps running in its thread until the board is reset.
+        self.reset()
+
+    def watch(self, run: bool = False):
+        # Bursts of edits are coalesced until WATCH_DEBOUNCE goes by without any (WATCH_SETTLE at most),
+        # then only what changed is pushed over the open session. With run, main.py is restarted by a soft reset
+        # and its output streamed until the next batch.
+        pyboard = self.filesystem.pyboard
+        watcher = Watcher(LISTENING_TO)
+        root = LISTENING_TO.replace(os.sep, '/')
+        known = {source.replace(root, '').strip('/') for source, _ in self.internal_ls('/')}
+        pending = set()
+        stopped = []
+        running = False
+        first = last = 0
+
+        def interrupt(signum, frame):
+            stopped.append(True)
+
+        handler = signal.signal(signal.SIGINT, interrupt)
+        print(f'<<< Watching "{root}" ({watcher.backend}), press Ctrl-C to stop')
+
+        try:
+            while not stopped:
+                if changes := watcher.poll(WATCH_INTERVAL):
+                    pending |= changes
+                    last = time.monotonic()
+                    first = first or last
+
+                if running and pyboard.serial.inWaiting() and pyboard.receive():
+                    sys.stdout.buffer.write(bytes(pyboard.buffer))
+                    sys.stdout.buffer.flush()
+                    pyboard.buffer.clear()
 
-print('-' * 50)
-picowatch.interrupt()
+                if not pending or (time.monotonic() - last < WATCH_DEBOUNCE and time.monotonic() - first < WATCH_SETTLE):
+                    continue
 
+                # A path under a directory that changed as a whole goes along with it.
+                paths = sorted(pending)
+                paths = [path for path in paths if not any(path.startswith(parent + '/') for parent in paths)]
+                changes = []
+                pending.clear()
+                first = 0
 
-try:
-    import readline
-    readline.parse_and_bind("tab: complete")
+                for path in paths:
+                    if os.path.exists(os.path.join(LISTENING_TO, path)):
+                        changes.append((1, path))
+                    elif path in known or any(filename.startswith(path + '/') for filename in known):
+                        changes.append((-1, path))
 
-    def complete(text, state):
-        
-        tabs = [
-            'help', 'modules', 'boot', 'system', 'os', 
-            'reset', 'flash', 'status', 'mod', 'commit', 'sync', 'exit',
-        ]
-        commands = [
-            'upload', 'put', 'download', 'get', 'delete', 'rm', 'test', 
-            'run', 'scan', 'ls', 'edit', 'vim', 'source', 'cat', 'compare', 
-            'diff', 'compile','mpy', 'install', 'mip',
-        ]
-        tabs.extend(commands)
-
-        line = readline.get_line_buffer().split('&')[-1].strip()
-
-        if line.startswith(tuple(commands)):
-            tabs = [f.replace(LISTENING_TO.replace('\\', '/'), '').lstrip('/') for f, _ in picowatch.internal_ls('/')]
-        elif line.startswith(tuple(tabs)):
-            tabs = ['&']
-        
-        return ([x + ' ' for x in tabs if x.startswith(text)] + [None])[state]
+                if not changes:
+                    continue
+
+                start = time.monotonic()
+
+                if running:
+                    self.interrupt()
+                    running = False
+
+                if '' in paths:
+                    self.mirror('/')
+                else:
+                    self.deploy(changes)
+
+                known = {source.replace(root, '').strip('/') for source, _ in self.internal_ls('/')}
+
+                if run:
+                    pyboard.send_ctrl_b()
+                    pyboard.read_until(b'>>> ')
+                    pyboard.send_ctrl_d()
+                    self.filesystem.forget()
+                    running = True
+
+                print(f'[∘] Synchronized in {round(time.monotonic() - start, 2)} s{", main.py restarted" if run else ""}')
+        finally:
+            signal.signal(signal.SIGINT, handler)
+            watcher.close()
+
+            if running:
+                self.interrupt()
+
+        print('<<< Watch stopped')
+
+
+class Prefixed(object):
+    stream: Any
+
+    def __init__(self, stream: Any):
+        self.stream = stream
+        self.buffer = self
+        self.local = threading.local()
+        self.lock = threading.Lock()
+
+    def prefix(self, device: Optional[str]):
+        self.local.device = device
+        self.local.pending = ''
+        self.local.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+    def write(self, text: Union[bytes, str]) -> int:
+        size = len(text)
+
+        if isinstance(text, (bytes, bytearray, memoryview)):
+            # A character split across two reads of the board is only decoded once its last byte is written.
+            if not hasattr(self.local, 'decoder'):
+                self.local.decoder = codecs.getincrementaldecoder('utf-8')('replace')
+
+            text = self.local.decoder.decode(bytes(text))
+
+        if not (device := getattr(self.local, 'device', None)):
+            self.stream.write(text)
+            return size
+
+        # Whole lines only, so the boards never interleave within a line.
+        *lines, self.local.pending = (self.local.pending + text).split('\n')
 
-    readline.set_completer(complete)
-except:
-    pass
+        with self.lock:
+            for line in lines:
+                line = line.rstrip('\r')
+                self.stream.write(f'[{device}] {line}\n')
 
+        return size
+
+    def flush(self):
+        if getattr(self.local, 'device', None) and self.local.pending.strip():
+            self.write('\n')
+
+        self.stream.flush()
+
+
+class Fleet(object):
+    boards: List[Picowatch]
+    shared: List[Picowatch]
+
+    def __init__(self, devices: List[str], baudrate: int = 115200, shared: Optional[List[Picowatch]] = None):
+        self.boards = []
+        shared = shared or []
+        # A device already opened by the console is reused, a serial port cannot be opened twice.
+        self.shared = [picowatch for picowatch in shared if picowatch.filesystem.pyboard.device in devices]
+        known = {picowatch.filesystem.pyboard.device: picowatch for picowatch in self.shared}
+        # The console's own handler keeps interrupting its board, the fleet's boards are interrupted from here.
+        handler = signal.getsignal(signal.SIGINT)
+
+        for device in devices:
+            if not (picowatch := known.get(device)):
+                picowatch = Picowatch(Pyboard(device, baudrate), handle_interrupt=False)
+
+                # The toggles set in the console (compression, bytecode) apply to the whole fleet.
+                if shared:
+                    picowatch.filesystem.compression = shared[0].filesystem.compression
+                    picowatch.deploy_mpy = shared[0].deploy_mpy
+
+            self.boards.append(picowatch)
+
+        def interrupt(signum, frame):
+            self.interrupt()
+
+            if callable(handler):
+                handler(signum, frame)
+
+        signal.signal(signal.SIGINT, interrupt)
+
+    def interrupt(self):
+        for picowatch in self.boards:
+            if picowatch not in self.shared:
+                picowatch.interrupt()
+
+    def close(self):
+        for picowatch in self.boards:
+            if picowatch not in self.shared:
+                picowatch.close()
+
+    def run(self, label: str, job: Callable[[Picowatch], None]):
+        stdout = sys.stdout
+        sys.stdout = output = Prefixed(stdout)
+
+        def worker(picowatch: Picowatch) -> Tuple[str, float, int, int]:
+            pyboard = picowatch.filesystem.pyboard
+            output.prefix(pyboard.device)
+            pyboard.quiet = True
+            picowatch.filesystem.telemetry.begin(label)
+            failures = 0
+
+            try:
+                job(picowatch)
+            except Exception as e:
+                failures += 1
+                print(f'[?] {str(e)}')
+            finally:
+                sys.stdout.flush()
+                pyboard.quiet = False
+
+            report = picowatch.filesystem.telemetry.end()
+            # Files that reached the board with a wrong checksum fail as well, without the job raising.
+            failures += len([file for file in report['files'] if file['checksum'] != 'OK'])
+
+            return (pyboard.device, report['seconds'], report['bytes_in'] + report['bytes_out'], failures)
+
+        try:
+            # One worker per port: every board is mostly waiting on its own serial line.
+            with ThreadPoolExecutor(max_workers=len(self.boards)) as pool:
+                summary = list(pool.map(worker, self.boards))
+        finally:
+            sys.stdout = stdout
+
+        tab = Tab(20, 15, 15, 15, nb_columns=4)
+        tab.head('Device', 'Time (s)', 'Bytes (kb)', 'Failures')
+
+        for device, elapsed, transferred, failures in summary:
+            tab.line(device, f'{round(elapsed, 2)}', f'{round(transferred / 1024, 2)}', str(failures))
+
+    def commit(self, message: str = ''):
+        # Git is only asked once, the boards are then synchronized in parallel and the commit made once they all are.
+        changes = self.boards[0].status(return_output=True)
+
+        if not changes:
+            print('Pyboards are up to date')
+            return
+
+        self.run(f'fleet commit {message}'.strip(), lambda picowatch: picowatch.deploy(changes))
+        self.boards[0].internal_commit(message)
+
+    def upload(self, filepath: Union[List, str]):
+        self.run(f'fleet upload {" ".join(filepath)}'.strip(), lambda picowatch: picowatch.upload(filepath))
+
+    def reset(self):
+        self.run('fleet reset', lambda picowatch: picowatch.reset())
+
+    def test(self, filename: str):
+        def job(picowatch: Picowatch):
+            picowatch.reset()
+            picowatch.test(filename)
+
+        self.run(f'fleet test {filename}', job)
+
+
+if __name__ == '__main__':
+    print('Welcome to Picowatch Terminal')
+    print(f'Listening to project: {LISTENING_TO.replace(os.sep, "/")}/')
+    picowatch = False
+    fleet = False
 
-while True:
     try:
-        unmessage = input('\033[1m\033[92m>>> \033[0m\033[0m').strip()
+        env = dotenv_values('.picowatch')
+        picowatch = Picowatch(Pyboard(env["DEVICE"], env["BAUDRATE"]))
+        print(f'Connected automatically to device: {env["DEVICE"]} at a baudrate of: {env["BAUDRATE"]}')
+    except:
+        while not picowatch:
+            print('-' * 50)
+            device = input('Port: ').strip()
+            baudrate = input('Baudrate (115200): ').strip() or 115200
 
-        for message in unmessage.split('&'):
             try:
-                match message.strip().split(' '):
-                    case ['?' | 'help']:
-                        print('These are common Picowatch keywords:')
-                        tab = Tab(12, 10, 32, nb_columns=4)
-                        tab.head('Keywords', 'Shortcut', 'Parameters', 'Description')
-                        tab.line('help', '?', '', 'Show keywords and their description.')
-                        tab.line('modules', '??', '', 'List availables modules on the Pyboard.')
-                        tab.line('boot', '.', '', 'Perform a soft reset and run main.py (if exists) in REPL mode.')
-                        tab.line('test', '!', '[<file>] (default: main.py)', 'Run a script from PC on the Pyboard and print out the results in raw-REPL mode.')
-                        tab.line('run', '!!', '[<file>] (default: main.py)', 'Run a script on the Pyboard and print out the results in raw-REPL mode.')
-                        tab.line('ctrl + C', '', '', 'Interrupts the currently running code in REPL or raw-REPL mode.')
-                        tab.line('ctrl + D', 'exit', '', 'Exit Picowatch Terminal.')
-                        tab.line('ctrl + Z', 'exit', '', 'Same as ctrl + D, Exit Picowatch Terminal.')
-                        tab.line('system', 'os', '', 'Pyboard name and version.')
-                        tab.line('reset', 'rs', '', 'Perform a soft reset from the REPL.')
-                        tab.line('flash', 'fl', '', 'Perform a flash disk from the REPL.')
-                        tab.line('scan', 'ls', '[<path>] (default: /)', 'List information about the file(s) on the Pyboard.')
-                        tab.line('edit', 'vim', '<file> [<use vim>]', 'Edit specified file from the PC (vim or vscode is required).')
-                        tab.line('source', 'cat', '<file>', 'Concatenate source code to standard output.')
-                        tab.line('delete', 'rm', '<path>', 'Delete file or directory contents on the Pyboard.')
-                        tab.line('upload', 'put', '<path>', 'Upload file or directory contents from the PC to the Pyboard.')
-                        tab.line('download', 'get', '<path>', 'Download file or directory contents from the Pyboard to the PC. Warning: this may cause file corruption.')
-                        tab.line('compare', 'diff', '<file> [<use vim>]', 'Compare source code from PC with source code from the Pyboard (vim or vscode is required).')
-                        tab.line('compile', 'mpy', '<python file>', 'Compile source file to mpy file.')
-                        tab.line('install', 'mip', '<package name>', 'Install packages from micropython-lib and from third-party sites (including GitHub) - *Network-capable boards only.')
-                        tab.line('status', 'mod', '', 'Show the working tree status (Git is required).')
-                        tab.line('commit', 'sync', '[<message>] (default: "")', 'Synchronize Pyboard along with associated commit(s) (Git is required).')
-                    case ['??' | 'modules']:
-                        picowatch.terminal(f'help("modules")')
-                    case ['os' | 'system']:
-                        picowatch.system()
-                    case ['ls' | 'scan', *file]:
-                        picowatch.listing(file[0] if file else '/')
-                    case ['vim' | 'edit', file, *use_vim]:
-                        if len(use_vim) > 0:
-                            subprocess.call(['vim', file], shell=True)
-                        else:
-                            subprocess.call(['code', file], shell=True)
-                    case ['cat' | 'source', file]:
-                        picowatch.contents(file)
-                    case ['rm' | 'delete', *path]:
-                        picowatch.delete(path)
-                    case ['put' | 'upload', *path]:
-                        picowatch.upload(path)
-                    case ['get' | 'download', *path]:
-                        picowatch.download(path)
-                    case ['diff' | 'compare', file, *use_vim]:
-                        picowatch.compare(file, use_vim=len(use_vim) > 0)
-                    case ['mod' | 'status']:
-                        picowatch.status(return_output=False)
-                    case ['sync' | 'commit', *message]:
-                        picowatch.commit(message=' '.join(message).strip())
-                    case ['mpy' | 'compile', file]:
-                        picowatch.compile(file)
-                    case ['mip' | 'install', package_name]:
-                        picowatch.install(package_name)
-                    case ['!' | 'test', *file]:
-                        picowatch.reset()
-                        picowatch.test(file[0] if file else 'main.py')
-                    case ['!!' | 'run', *file]:
-                        picowatch.reset()
-                        picowatch.launch(file[0] if file else 'main.py')
-                    case ['.'| 'boot']:
-                        picowatch.reset()
-                        picowatch.boot()
-                    case ['rs' | 'reset']:
-                        picowatch.reset()
-                    case ['fl' | 'flash']:
-                        picowatch.flash()
-                    case ['exit']:
-                        sys.exit('Picowatch Terminal disconnected!')
-                    case _:
-                        if message:
-                            print(f'Picowatch: "{message}" does not matched any keywords. See "help" for more informations.')
+                picowatch = Picowatch(Pyboard(device, baudrate))
+                print('-' * 50)
+                print(f'Connected to device: {device} and baudrate: {baudrate}')
+
+                with open(os.path.join(LISTENING_TO, '.picowatch'), 'w+') as fh:
+                    fh.write(f'DEVICE = "{device}"\n')
+                    fh.write(f'BAUDRATE = {baudrate}\n')
             except Exception as e:
                 print(str(e))
-    except (KeyboardInterrupt, EOFError):
-        sys.exit('Picowatch Terminal disconnected!')
+
+    print('-' * 50)
+    picowatch.interrupt()
+
+
+    try:
+        import readline
+        readline.parse_and_bind("tab: complete")
+
+        def complete(text, state):
+
+            tabs = [
+                'help', 'modules', 'boot', 'system', 'os', 
+                'reset', 'flash', 'status', 'mod', 'commit', 'sync', 'compress', 'zip', 'build', 'bd', 'bytecode', 'bc', 'fleet', 'report', 'watch', 'exit',
+            ]
+            commands = [
+                'upload', 'put', 'download', 'get', 'delete', 'rm', 'test', 
+                'run', 'scan', 'ls', 'edit', 'vim', 'source', 'cat', 'compare', 
+                'diff', 'compile','mpy', 'install', 'mip', 'mirror', 'mr', 'push', 'pull', 'tail',
+            ]
+            tabs.extend(commands)
+
+            line = readline.get_line_buffer().split('&')[-1].strip()
+
+            if line.startswith(tuple(commands)):
+                tabs = [f.replace(LISTENING_TO.replace('\\', '/'), '').lstrip('/') for f, _ in picowatch.internal_ls('/')]
+            elif line.startswith(tuple(tabs)):
+                tabs = ['&']
+
+            return ([x + ' ' for x in tabs if x.startswith(text)] + [None])[state]
+
+        readline.set_completer(complete)
+    except:
+        pass
+
+
+    while True:
+        try:
+            unmessage = input('\033[1m\033[92m>>> \033[0m\033[0m').strip()
+
+            for message in unmessage.split('&'):
+                picowatch.filesystem.telemetry.begin(message.strip())
+
+                try:
+                    match message.strip().split(' '):
+                        case ['?' | 'help']:
+                            print('These are common Picowatch keywords:')
+                            tab = Tab(12, 10, 32, nb_columns=4)
+                            tab.head('Keywords', 'Shortcut', 'Parameters', 'Description')
+                            tab.line('help', '?', '', 'Show keywords and their description.')
+                            tab.line('modules', '??', '', 'List availables modules on the Pyboard.')
+                            tab.line('boot', '.', '', 'Perform a soft reset and run main.py (if exists) in REPL mode.')
+                            tab.line('test', '!', '[<file>] (default: main.py)', 'Run a script from PC on the Pyboard and print out the results in raw-REPL mode.')
+                            tab.line('run', '!!', '[<file>] (default: main.py)', 'Run a script on the Pyboard and print out the results in raw-REPL mode.')
+                            tab.line('tail', '', '[<file>] (default: main.py)', 'Run a script on the Pyboard in a thread, print out its output and query the board (ls, mem) meanwhile (requires _thread).')
+                            tab.line('ctrl + C', '', '', 'Interrupts the currently running code in REPL or raw-REPL mode.')
+                            tab.line('ctrl + D', 'exit', '', 'Exit Picowatch Terminal.')
+                            tab.line('ctrl + Z', 'exit', '', 'Same as ctrl + D, Exit Picowatch Terminal.')
+                            tab.line('system', 'os', '', 'Pyboard name and version.')
+                            tab.line('reset', 'rs', '', 'Perform a soft reset from the REPL.')
+                            tab.line('flash', 'fl', '', 'Perform a flash disk from the REPL.')
+                            tab.line('scan', 'ls', '[<path>] (default: /)', 'List information about the file(s) on the Pyboard.')
+                            tab.line('edit', 'vim', '<file> [<use vim>]', 'Edit specified file from the PC (vim or vscode is required).')
+                            tab.line('source', 'cat', '<file>', 'Concatenate source code to standard output.')
+                            tab.line('delete', 'rm', '<path>', 'Delete file or directory contents on the Pyboard.')
+                            tab.line('upload', 'put', '<path>', 'Upload file or directory contents from the PC to the Pyboard.')
+                            tab.line('download', 'get', '<path>', 'Download file or directory contents from the Pyboard to the PC. Warning: this may cause file corruption.')
+                            tab.line('push', '', '<path>', 'Upload file or directory contents from the PC to the Pyboard as a single archive stream.')
+                            tab.line('pull', '', '[<path>] (default: /)', 'Download file or directory contents from the Pyboard to the PC as a single archive stream.')
+                            tab.line('compare', 'diff', '<file> [<use vim>]', 'Compare source code from PC with source code from the Pyboard (vim or vscode is required).')
+                            tab.line('compress', 'zip', '', 'Toggle compressed uploads, inflated on the Pyboard (requires the deflate module).')
+                            tab.line('compile', 'mpy', '<python file>', 'Compile source file to mpy file.')
+                            tab.line('build', 'bd', '', 'Compile every .py of the project to .mpy in parallel, cached by source, mpy-cross version and MPY_FLAGS (.picowatch).')
+                            tab.line('bytecode', 'bc', '', 'Toggle deploying the compiled .mpy in place of .py on upload and commit (main.py and boot.py excepted).')
+                            tab.line('install', 'mip', '<package name>', 'Install packages from micropython-lib and from third-party sites (including GitHub) - *Network-capable boards only.')
+                            tab.line('status', 'mod', '', 'Show the working tree status (Git is required).')
+                            tab.line('commit', 'sync', '[<message>] (default: "")', 'Synchronize Pyboard along with associated commit(s) (Git is required).')
+                            tab.line('report', '', '[json|ndjson|off] [<file>]', 'Write bytes in/out, round trips, handshake and per-file times of every command to a JSON (last command) or NDJSON (appended) report.')
+                            tab.line('fleet', '', '<commit|upload|reset|test> [<args>]', 'Run the keyword on every device listed in .picowatch (e.g. FLEET = "COM16,COM17") in parallel.')
+                            tab.line('watch', '', '[run]', 'Push every file changed on the PC as soon as it is saved, with run: soft reset and stream main.py after each push (ctrl + C to stop).')
+                            tab.line('mirror', 'mr', '[<path>] (default: /)', 'Make the Pyboard match the PC by comparing file hashes: upload what differs, delete what is missing on the PC.')
+                        case ['??' | 'modules']:
+                            picowatch.terminal(f'help("modules")')
+                        case ['os' | 'system']:
+                            picowatch.system()
+                        case ['ls' | 'scan', *file]:
+                            picowatch.listing(file[0] if file else '/')
+                        case ['vim' | 'edit', file, *use_vim]:
+                            if len(use_vim) > 0:
+                                subprocess.call(['vim', file], shell=True)
+                            else:
+                                subprocess.call(['code', file], shell=True)
+                        case ['cat' | 'source', file]:
+                            picowatch.contents(file)
+                        case ['rm' | 'delete', *path]:
+                            picowatch.delete(path)
+                        case ['put' | 'upload', *path]:
+                            picowatch.upload(path)
+                        case ['get' | 'download', *path]:
+                            picowatch.download(path)
+                        case ['push', *path]:
+                            picowatch.push(path)
+                        case ['pull', *path]:
+                            picowatch.pull(path)
+                        case ['diff' | 'compare', file, *use_vim]:
+                            picowatch.compare(file, use_vim=len(use_vim) > 0)
+                        case ['mod' | 'status']:
+                            picowatch.status(return_output=False)
+                        case ['sync' | 'commit', *message]:
+                            picowatch.commit(message=' '.join(message).strip())
+                        case ['mr' | 'mirror', *path]:
+                            picowatch.mirror(path[0] if path else '/')
+                        case ['zip' | 'compress']:
+                            picowatch.compression()
+                        case ['mpy' | 'compile', file]:
+                            picowatch.compile(file)
+                        case ['bd' | 'build']:
+                            picowatch.build()
+                        case ['bc' | 'bytecode']:
+                            picowatch.bytecode()
+                        case ['mip' | 'install', package_name]:
+                            picowatch.install(package_name)
+                        case ['!' | 'test', *file]:
+                            picowatch.reset()
+                            picowatch.test(file[0] if file else 'main.py')
+                        case ['!!' | 'run', *file]:
+                            picowatch.reset()
+                            picowatch.launch(file[0] if file else 'main.py')
+                        case ['tail', *file]:
+                            picowatch.reset()
+                            picowatch.tail(file[0] if file else 'main.py')
+                        case ['watch', *options]:
+                            picowatch.watch(run='run' in options)
+                        case ['.'| 'boot']:
+                            picowatch.reset()
+                            picowatch.boot()
+                        case ['rs' | 'reset']:
+                            picowatch.reset()
+                        case ['fl' | 'flash']:
+                            picowatch.flash()
+                        case ['report', *options]:
+                            picowatch.report(*options)
+                        case ['fleet', *job]:
+                            if not fleet:
+                                env = dotenv_values('.picowatch')
+
+                                if not env.get('FLEET'):
+                                    raise Exception('Picowatch: no devices listed, add FLEET = "<port>,<port>,..." to .picowatch.')
+
+                                fleet = Fleet([d.strip() for d in env['FLEET'].split(',') if d.strip()], env.get('BAUDRATE') or 115200, shared=[picowatch])
+
+                            match job:
+                                case ['sync' | 'commit', *message]:
+                                    fleet.commit(message=' '.join(message).strip())
+                                case ['put' | 'upload', *path]:
+                                    fleet.upload(path)
+                                case ['rs' | 'reset']:
+                                    fleet.reset()
+                                case ['!' | 'test', *file]:
+                                    fleet.test(file[0] if file else 'main.py')
+                                case _:
+                                    print('Picowatch: fleet keywords are commit, upload, reset and test.')
+                        case ['exit']:
+                            if fleet:
+                                fleet.close()
+
+                            picowatch.close()
+                            sys.exit('Picowatch Terminal disconnected!')
+                        case _:
+                            if message:
+                                print(f'Picowatch: "{message}" does not matched any keywords. See "help" for more informations.')
+                except Exception as e:
+                    print(str(e))
+                finally:
+                    try:
+                        picowatch.filesystem.telemetry.end()
+                    except Exception as e:
+                        print(f'Report: {str(e)}')
+        except (KeyboardInterrupt, EOFError):
+            if fleet:
+                fleet.close()
+
+            picowatch.close()
+            sys.exit('Picowatch Terminal disconnected!')
@@ -18,15 +18,19 @@ class status:
 
     STATUS_200_OK: int = 200
     STATUS_204_NO_CONTENT: int = 204
+    STATUS_206_PARTIAL_CONTENT: int = 206
     STATUS_307_TEMPORARY_REDIRECT: int = 307
     STATUS_308_PERMANENT_REDIRECT: int = 308
     STATUS_400_BAD_REQUEST: int = 400
     STATUS_401_UNAUTHORIZED: int = 401
     STATUS_403_FORBIDDEN: int = 403
     STATUS_404_NOT_FOUND: int = 404
+    STATUS_405_METHOD_NOT_ALLOWED: int = 405
     STATUS_411_LENGTH_REQUIRED: int = 411
     STATUS_415_UNSUPPORTED_MEDIA_TYPE: int = 415
+    STATUS_416_RANGE_NOT_SATISFIABLE: int = 416
     STATUS_422_UNPROCESSABLE_ENTITY: int = 422
+    STATUS_431_REQUEST_HEADER_FIELDS_TOO_LARGE: int = 431
     STATUS_500_INTERNAL_SERVER_ERROR: int = 500
     STATUS_501_NOT_IMPLEMENTED: int = 501
     STATUS_503_SERVICE_UNAVAILABLE: int = 503
@@ -34,15 +38,19 @@ class status:
     STATUS_TEXTS: dict[int, str] = {
         STATUS_200_OK: 'HTTP/1.1 200 OK',
         STATUS_204_NO_CONTENT: 'HTTP/1.1 204 No Content',
+        STATUS_206_PARTIAL_CONTENT: 'HTTP/1.1 206 Partial Content',
         STATUS_307_TEMPORARY_REDIRECT: 'HTTP/1.1 307 Temporary Redirect',
         STATUS_308_PERMANENT_REDIRECT: 'HTTP/1.1 308 Permanent Redirect',
         STATUS_400_BAD_REQUEST: 'HTTP/1.1 400 Bad Request',
         STATUS_401_UNAUTHORIZED: 'HTTP/1.1 401 Unauthorized',
         STATUS_403_FORBIDDEN: 'HTTP/1.1 403 Forbidden',
         STATUS_404_NOT_FOUND: 'HTTP/1.1 404 Not Found',
+        STATUS_405_METHOD_NOT_ALLOWED: 'HTTP/1.1 405 Method Not Allowed',
         STATUS_411_LENGTH_REQUIRED: 'HTTP/1.1 411 Length Required',
         STATUS_415_UNSUPPORTED_MEDIA_TYPE: 'HTTP/1.1 415 Unsupported Media Type',
+        STATUS_416_RANGE_NOT_SATISFIABLE: 'HTTP/1.1 416 Range Not Satisfiable',
         STATUS_422_UNPROCESSABLE_ENTITY: 'HTTP/1.1 422 Unprocessable Entity',
+        STATUS_431_REQUEST_HEADER_FIELDS_TOO_LARGE: 'HTTP/1.1 431 Request Header Fields Too Large',
         STATUS_500_INTERNAL_SERVER_ERROR: 'HTTP/1.1 500 Internal Server Error',
         STATUS_501_NOT_IMPLEMENTED: 'HTTP/1.1 500 Not Implemented',
         STATUS_503_SERVICE_UNAVAILABLE: 'HTTP/1.1 503 Service Unavailable',
@@ -84,20 +92,37 @@ class media:
         return media.CONTENT_TYPES.get(extension.lower(), 'application/octet-stream')
 
 
-def url_decode(encoded: str) -> str:
-    i = 0
-    decoded: str = ''
-    encoded = encoded.replace('+', ' ')
+def url_decode(encoded: str|bytes) -> str:
+    # One pass over the %-escapes, the bytes are decoded as UTF-8 at once (multi-byte characters included).
+    if isinstance(encoded, str):
+        encoded = encoded.encode('utf-8')
 
-    while i < len(encoded):
-        if encoded[i] == '%':
-            decoded += chr(int(encoded[i + 1:i + 3], 16))
-            i += 3
-        else:
-            decoded += encoded[i]
-            i += 1
+    if len(parts := encoded.replace(b'+', b' ').split(b'%')) == 1:
+        return str(parts[0], 'utf-8')
+
+    decoded = bytearray(parts[0])
+
+    for part in parts[1:]:
+        try:
+            # int() would also take a sign or a space (a '+' already turned into one): only two hex digits are an escape.
+            if len(part) < 2 or any(c not in b'0123456789abcdefABCDEF' for c in part[:2]):
+                raise ValueError
+
+            decoded.append(int(part[:2], 16))
+            decoded.extend(part[2:])
+        except ValueError:
+            decoded.extend(b'%')
+            decoded.extend(part)
+
+    return str(decoded, 'utf-8')
 
-    return decoded
+
+def parse_query(encoded: bytes|memoryview, into: dict) -> dict:
+    for pair in bytes(encoded).split(b'&'):
+        if (i := pair.find(b'=')) >= 0:
+            into[url_decode(pair[:i])] = url_decode(pair[i + 1:])
+
+    return into
     
 
 def unique_id(length: int = 8, seeds: str = 'ABCDEFGHIJKLMNOPQRSTUVWXYZ0123456789') -> str:
@@ -276,9 +301,18 @@ class WiFi:
 class HTTPService:
 
     SERVICE_HEALTH: int = 0
+    HEAD_SIZE: int = 1024
+    HEAD_LIMIT: int = 8192
+    KEEP_ALIVE_TIMEOUT: int = 5
+    KEEP_ALIVE_REQUESTS: int = 16
+    CHUNK_SIZE: int = 2048
+    CHUNKS: list[bytearray] = []
+    METHODS: tuple[str] = ('GET', 'POST', 'HEAD', 'PUT', 'DELETE', 'PATCH', 'OPTIONS')
+    PATTERN_CHARS: str = '\\^$|?*+()[]{}.'
 
     def __init__(self):
-        self.__items: dict[str, tuple[list[str], callable]] = {}
+        self.__routes: dict[tuple[str, str], callable] = {}
+        self.__patterns: dict[str, list[tuple[object, list[str], callable]]] = {}
         self.__static_items: dict[str, str] = {}
     
     def mount(self, path: str, name: str = ''):
@@ -291,89 +325,164 @@ class HTTPService:
             raise Exception(f'"{path}" is not a valid directory!')
         
     def map(self, methods: str, pattern: str, callback: callable) -> callable[[Request], str]:
-        self.__items[pattern] = (list(map(lambda s: s.strip(), methods.upper().split('|'))), callback)
+        methods = list(map(lambda s: s.strip(), methods.upper().split('|')))
+
+        # Literal routes are found with a single lookup, patterns are compiled once and grouped by their first segment.
+        # A '.' still matches any character: such a route ('/favicon.png') is found by the lookup when requested as
+        # written, by its pattern otherwise.
+        if not any(c in pattern for c in HTTPService.PATTERN_CHARS if c != '.'):
+            for method in methods:
+                self.__routes[(method, pattern)] = callback
+
+        if any(c in pattern for c in HTTPService.PATTERN_CHARS):
+            segment = pattern.split('/')[1] if pattern.startswith('/') else ''
+
+            if any(c in segment for c in HTTPService.PATTERN_CHARS):
+                segment = ''
+
+            # An alternation outside any group may match another first segment: such patterns are tried for every path.
+            depth = 0
+            escaped = in_class = False
+
+            for c in pattern:
+                if escaped:
+                    escaped = False
+                elif c == '\\':
+                    escaped = True
+                elif in_class:
+                    in_class = c != ']'
+                elif c == '[':
+                    in_class = True
+                elif c == '(':
+                    depth += 1
+                elif c == ')':
+                    depth -= 1
+                elif c == '|' and depth == 0:
+                    segment = ''
+                    break
+
+            if segment not in self.__patterns:
+                self.__patterns[segment] = []
+
+            self.__patterns[segment].append((re.compile(f'^{pattern}$'), methods, callback))
+
         return callback
+
+    def route(self, method: str, url: str) -> tuple[callable, list, list[str]]:
+        if (callback := self.__routes.get((method, url))):
+            return (callback, [], [])
+
+        allowed = [m for m in HTTPService.METHODS if (m, url) in self.__routes]
+        segment = url.split('/')[1] if url.startswith('/') else ''
+
+        for group in [segment, ''] if segment != '' else ['']:
+            for regex, methods, callback in self.__patterns.get(group, []):
+                if (match := regex.match(url)):
+                    if method in methods:
+                        return (callback, [v for v in match.groups() if v is not None], [])
+
+                    allowed.extend([m for m in methods if m not in allowed])
+
+        # HEAD is served by the GET route when it has none of its own.
+        if 'GET' in allowed and 'HEAD' not in allowed:
+            allowed.append('HEAD')
+
+        return (None, [], allowed)
     
     async def init(self, port: int = 80):
         async def client_callback(stream: asyncio.StreamReader, stream_client: asyncio.asyncioStreamWriter):
+            # Requests are served one after the other on the same stream until the client closes it,
+            # stays idle for KEEP_ALIVE_TIMEOUT seconds or has sent KEEP_ALIVE_REQUESTS of them.
+            reader: HTTPService.Reader = HTTPService.Reader(stream, HTTPService.HEAD_SIZE)
+
             try:
-                gc.collect()
-                request: HTTPService.Request = HTTPService.Request()
+                for remaining in range(HTTPService.KEEP_ALIVE_REQUESTS - 1, -1, -1):
+                    gc.collect()
+                    request: HTTPService.Request = HTTPService.Request()
 
-                while True:
-                    if (line := (await stream.readline()).decode('utf-8').strip()) == '':
+                    try:
+                        head = await asyncio.wait_for(reader.head(), HTTPService.KEEP_ALIVE_TIMEOUT)
+                    except asyncio.TimeoutError:
                         break
 
-                    if len(request.headers) == 0:
-                        if (match := re.compile(r'(GET|POST)\s+([^\s]+)\s+HTTP').search(line)):
-                            if len(uu := match.group(2).split('?')) == 2:
-                                for pp in uu[1].split('&'):
-                                    if len(p := pp.split('=')) == 2:
-                                        request.GETs[url_decode(p[0])] = url_decode(p[1])
-
-                            request.url = uu[0]
-                            request.method = match.group(1)
-                    
-                    if len(splitted_line := line.split(': ')) == 2:
-                        request.headers[str(splitted_line[0]).lower()] = splitted_line[1]
-
-                if not request.url:
-                    return
-
-                url: str = request.url
-                method: str = request.method
-                content: str|bytes = ''
+                    if not head or not request.parse(*head):
+                        # A head that did not fit in HEAD_SIZE or could not be parsed is answered, then the connection closes.
+                        if head or reader.overflow:
+                            request.keep_alive = False
+                            request.abort(status.STATUS_400_BAD_REQUEST if head else status.STATUS_431_REQUEST_HEADER_FIELDS_TOO_LARGE)
+                            await request.write_back(stream_client, '')
+                            print(f'{serv_crontab.datetime} - {request.method} {request.status_code} {request.url} ({request.content_type})')
 
-                for name, path in self.__static_items.items():
-                    if request.url.startswith(name) and (filename := f'{path}{request.url[len(name):]}'):
-                        content = request.content_to_media(filename)
                         break
 
-                if request.status_code == 0 and request.method == 'POST':
-                    try:
-                        if (content_length := int(request.headers['content-length'])) > 0:
-                            multipart: bytes = await stream.readexactly(content_length)
-
-                            try:
-                                content_type = str(request.headers['content-type']).lower()
-
-                                if 'application/json' in content_type:
-                                    request.POSTs = json.loads(multipart)
-                                elif 'application/x-www-form-urlencoded' in content_type:
-                                    for p in multipart.decode('utf-8').split('&'):
-                                        k, v = p.split('=')
-                                        request.POSTs[url_decode(k)] = url_decode(v)
-                                else:
-                                    raise TypeError
-                            except:
-                                request.abort(status.STATUS_415_UNSUPPORTED_MEDIA_TYPE)
-                    except:
-                        request.abort(status.STATUS_411_LENGTH_REQUIRED)
-
-                if request.status_code == 0:
-                    for pattern, item in self.__items.items():
-                        if request.method not in item[0]:
-                            continue
-                        
-                        if pattern == request.url or (match := re.match(f'^{pattern}$', request.url)):
+                    url: str = request.url
+                    method: str = request.method
+                    content: str|bytes = ''
+                    consumed: bool = False
+
+                    for name, path in self.__static_items.items():
+                        if request.url.startswith(name) and (filename := f'{path}{request.url[len(name):]}'):
+                            content = request.content_to_media(filename)
+                            break
+
+                    if request.status_code == 0 and request.method in ('POST', 'PUT', 'PATCH'):
+                        try:
+                            if (content_length := int(request.headers['content-length'])) > 0:
+                                multipart: bytes = await reader.read(content_length)
+                                consumed = True
+
+                                try:
+                                    content_type = str(request.headers['content-type']).lower()
+
+                                    if 'application/json' in content_type:
+                                        request.POSTs = json.loads(multipart)
+                                    elif 'application/x-www-form-urlencoded' in content_type:
+                                        parse_query(multipart, request.POSTs)
+                                    else:
+                                        raise TypeError
+                                except:
+                                    request.abort(status.STATUS_415_UNSUPPORTED_MEDIA_TYPE)
+                        except:
+                            request.abort(status.STATUS_411_LENGTH_REQUIRED)
+
+                    if request.status_code == 0:
+                        callback, args, allowed = self.route(request.method, request.url)
+
+                        if not callback and request.method == 'HEAD':
+                            callback, args, allowed = self.route('GET', request.url)
+
+                        if callback:
                             try:
-                                args = match.groups() if match else []
-                                content = await item[1](request, *[v for v in args if v is not None]) or ''
+                                content = await callback(request, *args) or ''
                             
                                 if request.status_code == 0:
                                     request.send_status_code(status.STATUS_200_OK)
                             except:
                                 request.abort(status.STATUS_500_INTERNAL_SERVER_ERROR)
-                            finally:
-                                break
-                    else:
-                        request.abort(status.STATUS_404_NOT_FOUND)
+                        elif allowed:
+                            request.update_headers_to_send({'Allow': ', '.join(allowed)})
+                            request.abort(status.STATUS_405_METHOD_NOT_ALLOWED)
+                        else:
+                            request.abort(status.STATUS_404_NOT_FOUND)
 
-                await request.write_back(stream_client, content)
-                print(f'{serv_crontab.datetime} - {method} {request.status_code} {url} ({request.content_type})')
+                    # A body left unread would be taken for the next request.
+                    if not consumed and (request.headers.get('content-length', '0') != '0' or 'transfer-encoding' in request.headers):
+                        request.keep_alive = False
+
+                    request.keep_alive = request.keep_alive and remaining > 0
+                    await request.write_back(stream_client, content)
+                    print(f'{serv_crontab.datetime} - {method} {request.status_code} {url} ({request.content_type})')
+
+                    if not request.keep_alive:
+                        break
             except Exception as e:
                 print(f'HTTPService.client_callback(): {e}')
-                stream_client.close()
+            finally:
+                try:
+                    stream_client.close()
+                    await stream_client.wait_closed()
+                except:
+                    pass
             
         shutdown_event = asyncio.Event()
 
@@ -413,12 +522,45 @@ class HTTPService:
         def __init__(self):
             self.url: str = ''
             self.method: str = 'GET'
+            self.keep_alive: bool = False
             self.headers: dict = {}
             self.GETs: dict = {}
             self.POSTs: dict = {}
 
             self.__Response: HTTPService.Response = HTTPService.Response()
 
+        def parse(self, head: bytes, end: int) -> bool:
+            # Request line and header fields are located by offsets in the head, nothing is split or stripped.
+            mv = memoryview(head)
+
+            if (line_end := head.find(b'\r\n', 0, end)) < 0:
+                line_end = end
+
+            if (i := head.find(b' ', 0, line_end)) <= 0 or (j := head.find(b' ', i + 1, line_end)) < 0:
+                return False
+
+            try:
+                if (k := head.find(b'?', i + 1, j)) >= 0:
+                    parse_query(mv[k + 1:j], self.GETs)
+                else:
+                    k = j
+
+                self.method = str(mv[:i], 'ascii')
+                self.url = str(mv[i + 1:k], 'utf-8')
+                self.headers = HTTPService.Headers(head, line_end + 2, end)
+                connection = self.headers.get('connection', '').lower()
+            except (ValueError, UnicodeError):
+                # Escapes or bytes that are not UTF-8.
+                return False
+
+            # HTTP/1.1 connections persist unless told otherwise, HTTP/1.0 ones only when asked to.
+            if head.find(b'HTTP/1.1', j + 1, line_end) >= 0:
+                self.keep_alive = 'close' not in connection
+            else:
+                self.keep_alive = 'keep-alive' in connection
+
+            return True
+
         def send_status_code(self, status_code: int):
             self.__Response.status_code = int(status_code)
 
@@ -460,12 +602,12 @@ class HTTPService:
     
         def content_to_attachment(self, filename: str) -> bytes:
             try:
-                if os.stat(filename)[0] & 0x4000 == 0:
+                if (stat := os.stat(filename))[0] & 0x4000 == 0:
                     self.__Response.headers['Content-Type'] = media.type(filename.split('.')[-1])
                     self.__Response.headers['Content-disposition'] = f'attachment; filename="{filename.split("/")[-1]}"'
-                    self.__Response.status_code = status.STATUS_200_OK
+                    self.content_range(filename, stat[6])
 
-                    return open(filename, 'rb').read()
+                    return b''
                 else:
                     self.__Response.status_code = status.STATUS_404_NOT_FOUND
             except:
@@ -476,19 +618,63 @@ class HTTPService:
                 if (stat := os.stat(filename))[0] & 0x4000 == 0:
                     self.__Response.headers.update(headers)
                     self.__Response.headers['Content-Type'] = media.type(filename.split('.')[-1])
-                    self.__Response.headers['Content-Length'] = stat[6]
-                    self.__Response.status_code = status.STATUS_200_OK
+                    self.content_range(filename, stat[6])
                     
-                    return open(filename, 'rb').read()
+                    return b''
                 else:
                     self.__Response.status_code = status.STATUS_404_NOT_FOUND
             except:
                 self.__Response.status_code = status.STATUS_500_INTERNAL_SERVER_ERROR
 
+        def content_range(self, filename: str, size: int):
+            # A single "Range: bytes=" of a GET or HEAD is answered with 206 and that part of the file only.
+            # Several ranges or a malformed one get the whole file, as if no range had been asked for.
+            self.__Response.headers['Accept-Ranges'] = 'bytes'
+            self.__Response.status_code = status.STATUS_200_OK
+            self.__Response.file = (filename, 0, size)
+            ranges = self.headers.get('range', '')
+
+            if self.method not in ('GET', 'HEAD') or not ranges.startswith('bytes=') or ',' in ranges:
+                return
+
+            first, dash, last = ranges[6:].strip().partition('-')
+
+            # Plain digits only, int() would also take a sign: "bytes=--5" or "bytes=0--3" are malformed, not unsatisfiable.
+            if not dash or not (first or last) or not all(value.isdigit() for value in (first, last) if value):
+                return
+
+            if first:
+                start, end = int(first), (int(last) if last else size - 1)
+            else:
+                start, end = max(0, size - int(last)), size - 1
+
+            if end < start and first and last:
+                return
+
+            if start >= size or end < start:
+                self.__Response.status_code = status.STATUS_416_RANGE_NOT_SATISFIABLE
+                self.__Response.headers['Content-Range'] = f'bytes */{size}'
+                self.__Response.file = None
+            else:
+                end = min(end, size - 1)
+                self.__Response.status_code = status.STATUS_206_PARTIAL_CONTENT
+                self.__Response.headers['Content-Range'] = f'bytes {start}-{end}/{size}'
+                self.__Response.file = (filename, start, end - start + 1)
+
         async def write_back(self, stream_client: asyncio.asyncioStreamWriter, content: str|bytes):
             led.value(1)
 
             try:
+                if not isinstance(content, (bytes, bytearray)):
+                    content = bytes(str(content or ''), 'utf-8')
+
+                # The length is always sent, it is what lets the client reuse the connection for its next request.
+                self.__Response.headers['Content-Length'] = self.__Response.file[2] if self.__Response.file else len(content)
+                self.__Response.headers['Connection'] = 'keep-alive' if self.keep_alive else 'close'
+
+                if self.keep_alive:
+                    self.__Response.headers['Keep-Alive'] = f'timeout={HTTPService.KEEP_ALIVE_TIMEOUT}'
+
                 stream_client.write(bytes(f'{self.status_text}\r\n', 'utf-8'))
 
                 for name, value in self.headers_to_send.items():
@@ -498,22 +684,139 @@ class HTTPService:
                 stream_client.write(bytes('\r\n', 'utf-8'))
                 await stream_client.drain()
 
-                if content:
-                    stream_client.write(bytes(content, 'utf-8'))
+                if self.__Response.file and self.method != 'HEAD':
+                    await self.write_file(stream_client, *self.__Response.file)
+                elif content and self.method != 'HEAD':
+                    stream_client.write(content)
                     await stream_client.drain()
             except Exception as e:
+                self.keep_alive = False
                 print(f'HTTPService.Request.write_back("{self.url}"): {e}')
-            finally:
-                stream_client.close()
-                await stream_client.wait_closed()
             
             led.value(0)
 
+        async def write_file(self, stream_client: asyncio.asyncioStreamWriter, filename: str, offset: int, length: int):
+            # Files are sent from flash through a pooled buffer of CHUNK_SIZE bytes, whatever their size.
+            buffer = HTTPService.CHUNKS.pop() if HTTPService.CHUNKS else bytearray(HTTPService.CHUNK_SIZE)
+            mv = memoryview(buffer)
+
+            try:
+                with open(filename, 'rb') as fh:
+                    fh.seek(offset)
+
+                    while length > 0:
+                        if not (n := fh.readinto(mv[:min(length, len(buffer))])):
+                            raise EOFError(f'{filename} is shorter than announced')
+
+                        stream_client.write(mv[:n])
+                        await stream_client.drain()
+                        length -= n
+            finally:
+                HTTPService.CHUNKS.append(buffer)
+
+    class Reader:
+
+        def __init__(self, stream: asyncio.StreamReader, size: int):
+            self.stream = stream
+            self.buffer: bytearray = bytearray(size)
+            self.start: int = 0
+            self.end: int = 0
+            self.overflow: bool = False
+
+        async def head(self) -> tuple[bytes, int]:
+            # The head is read into the reusable buffer, whatever came after it stays there for read().
+            mv = memoryview(self.buffer)
+
+            if self.start == self.end:
+                self.start = self.end = 0
+            elif self.start > 0:
+                self.buffer[:self.end - self.start] = bytes(mv[self.start:self.end])
+                self.end -= self.start
+                self.start = 0
+
+            scanned = 0
+
+            while True:
+                # Only the bytes just read (and the 3 before, for a separator split across reads) are searched, the head
+                # itself is copied once when complete.
+                base = max(0, scanned - 3)
+
+                if (i := bytes(mv[base:self.end]).find(b'\r\n\r\n')) >= 0:
+                    self.start = base + i + 4
+                    return (bytes(mv[:self.end]), base + i)
+
+                if self.end == len(self.buffer):
+                    # Long cookies or query strings double the buffer, up to HEAD_LIMIT.
+                    if len(self.buffer) >= HTTPService.HEAD_LIMIT:
+                        self.overflow = True
+                        return None
+
+                    self.buffer = self.buffer + bytearray(min(len(self.buffer), HTTPService.HEAD_LIMIT - len(self.buffer)))
+                    mv = memoryview(self.buffer)
+
+                if not (n := await self.stream.readinto(mv[self.end:])):
+                    return None
+
+                scanned = self.end
+                self.end += n
+
+        async def read(self, size: int) -> bytes:
+            n = min(size, self.end - self.start)
+            data = bytes(memoryview(self.buffer)[self.start:self.start + n])
+            self.start += n
+
+            if n < size:
+                data += await self.stream.readexactly(size - n)
+
+            return data
+
+    class Headers:
+
+        def __init__(self, head: bytes, start: int, end: int):
+            # Only names are decoded here, values are decoded on access.
+            self.__head: bytes = head
+            self.__fields: dict[str, tuple[int, int]] = {}
+            mv = memoryview(head)
+
+            while start < end:
+                if (line_end := head.find(b'\r\n', start, end)) < 0:
+                    line_end = end
+
+                if (i := head.find(b':', start, line_end)) > start:
+                    j = i + 1
+
+                    while j < line_end and head[j] == 32:
+                        j += 1
+
+                    self.__fields[str(mv[start:i], 'ascii').lower()] = (j, line_end)
+
+                start = line_end + 2
+
+        def __getitem__(self, name: str) -> str:
+            i, j = self.__fields[name.lower()]
+            return str(memoryview(self.__head)[i:j], 'utf-8').rstrip()
+
+        def __contains__(self, name: str) -> bool:
+            return name.lower() in self.__fields
+
+        def __len__(self) -> int:
+            return len(self.__fields)
+
+        def get(self, name: str, default: str = None) -> str:
+            return self[name] if name.lower() in self.__fields else default
+
+        def keys(self) -> list[str]:
+            return list(self.__fields.keys())
+
+        def items(self) -> list[tuple[str, str]]:
+            return [(name, self[name]) for name in self.__fields]
+
     class Response:
 
         def __init__(self):
             self.headers: dict = {'Content-Type': 'text/html'}
             self.status_code: int = HTTPService.SERVICE_HEALTH
+            self.file: tuple[str, int, int] = None
 
 
 class WebSocketService: